@@ -0,0 +1,174 @@
+"""Admission control for write requests.
+
+SQLite has a single writer, so once it saturates, extra writes only wait
+on the connection pool while holding memory and sockets, and their latency
+leaks into everything else on the event loop. This middleware bounds that
+queue before any database work starts:
+
+- each client gets a token bucket of write requests (429 when empty);
+- at most `max_concurrent` writes run at once, up to `max_queued` more wait
+  for at most `queue_timeout` seconds, and the rest are shed (503).
+
+Both rejections carry `Retry-After`. Reads and SSE streams are never
+limited here.
+
+Behind a reverse proxy every request arrives from the proxy's address, so
+requests from `trusted_proxies` are keyed on the client address the proxy
+reports in X-Forwarded-For (or X-Real-IP) instead.
+"""
+import asyncio
+import ipaddress
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+from . import metrics
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+admission_rejections = metrics.registry.register(metrics.Counter(
+    "admission_rejected_total",
+    "Write requests rejected before reaching the database, by reason.",
+    ("reason",),
+))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app,
+        rate: float = 20.0,
+        burst: float = 40.0,
+        max_concurrent: int = 32,
+        max_queued: int = 128,
+        queue_timeout: float = 2.0,
+        max_clients: int = 10000,
+        path_prefix: str = "/api/",
+        trusted_proxies: Iterable[str] = (),
+    ):
+        self.app = app
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self.path_prefix = path_prefix
+        self.trusted_proxies = [ipaddress.ip_network(p.strip(), strict=False) for p in trusted_proxies if p.strip()]
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        metrics.registry.register(metrics.Gauge(
+            "admission_in_flight_writes", "Write requests currently admitted.", fn=lambda: self.in_flight
+        ))
+        metrics.registry.register(metrics.Gauge(
+            "admission_queued_writes", "Write requests waiting for a slot.", fn=lambda: self.queued
+        ))
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        wait = self._bucket(self._client_key(scope)).take(time.monotonic())
+        if wait:
+            admission_rejections.inc(reason="rate_limited")
+            await _reject(send, 429, "Too many write requests", wait)
+            return
+
+        if not await self._acquire():
+            admission_rejections.inc(reason="overloaded")
+            await _reject(send, 503, "Server is busy, retry shortly", self.queue_timeout)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, time.monotonic())
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    async def _acquire(self) -> bool:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.queued >= self.max_queued:
+            return False
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.queued -= 1
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client_key(self, scope) -> str:
+        client: Tuple[str, int] | None = scope.get("client")
+        address = client[0] if client else "unknown"
+        if not self._trusted(address):
+            return address
+        headers = dict(scope["headers"])
+        # The right-most address not added by one of our own proxies is the
+        # client; anything left of it could be forged by the client.
+        forwarded: List[str] = [
+            hop.strip() for hop in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",") if hop.strip()
+        ]
+        for hop in reversed(forwarded):
+            if not self._trusted(hop):
+                return hop
+        real_ip = headers.get(b"x-real-ip", b"").decode("latin-1").strip()
+        return real_ip or (forwarded[0] if forwarded else address)
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
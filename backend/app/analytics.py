@@ -0,0 +1,73 @@
+"""Rebuild of the sales rollups.
+
+sales_item_hourly and sales_hourly are maintained incrementally by crud on
+every checkout and delivery. If they ever drift (a restore, a manual fix to
+an order), `python -m app.analytics rebuild` recomputes them from the live
+and archived orders. Each batch of `batch_size` order ids is aggregated by
+one INSERT ... SELECT ... GROUP BY per table, so SQLite does the work in
+bulk rather than row by row in Python.
+
+The whole rebuild is a single write transaction, so checkouts wait for it
+and never double count against a half-built rollup.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from sqlalchemy import text
+from . import crud
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 10000
+_SOURCES = (("orders", "order_items"), ("orders_archive", "order_items_archive"))
+
+
+async def _rebuild(session, batch_size: int) -> int:
+    await session.execute(text("DELETE FROM sales_item_hourly"))
+    await session.execute(text("DELETE FROM sales_hourly"))
+    batch = "o.id BETWEEN :first AND :last"
+    orders_seen = 0
+    for orders, items in _SOURCES:
+        first, last, count = (await session.execute(text(f"SELECT MIN(id), MAX(id), COUNT(*) FROM {orders}"))).one()
+        if not count:
+            continue
+        orders_seen += count
+        item_upsert = text(crud.sales_upsert(
+            "sales_item_hourly", "menu_item_id, hour", crud.item_sales_select(orders, items, batch)
+        ))
+        hourly_upsert = text(crud.sales_upsert("sales_hourly", "hour", crud.hourly_sales_select(orders, batch)))
+        for start in range(first, last + 1, batch_size):
+            bounds = {"first": start, "last": start + batch_size - 1}
+            await session.execute(item_upsert, bounds)
+            await session.execute(hourly_upsert, bounds)
+    return orders_seen
+
+
+async def rebuild_sales_rollups(batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Recompute the sales rollups from raw orders; returns the number of
+    orders aggregated."""
+    orders = await crud.run_write(lambda session: _rebuild(session, batch_size))
+    logger.info("Rebuilt sales rollups", extra={"orders": orders})
+    return orders
+
+
+async def _cli(args):
+    from .main import prepare_database
+    from .database import read_engine
+    try:
+        await prepare_database()
+        print(json.dumps({"orders": await rebuild_sales_rollups(args.batch_size)}))
+    finally:
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="recompute the sales rollups from raw orders")
+    rebuild.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+    asyncio.run(_cli(parser.parse_args()))
@@ -0,0 +1,179 @@
+"""Archival of delivered orders.
+
+Delivered orders are only ever read again by id, yet they make up most of
+the orders and order_items tables and every index on them. This job moves
+delivered orders that haven't changed for `archive_after_days` into
+orders_archive / order_items_archive in the same database file, where
+`crud.get_order` still finds them, and deletes their order_changes rows.
+
+Each batch is one short write transaction (through the group-commit writer
+when it runs), with a pause between batches so checkouts queued behind it
+wait for at most one batch. Afterwards the live database is compacted:
+the WAL is checkpointed and truncated, free pages are returned to the OS
+when the file uses incremental auto-vacuum (otherwise SQLite reuses them
+for new rows), and the query planner statistics are refreshed.
+
+Run it from the command line with `python -m app.archive`; the API also
+runs it every `archive_interval` seconds while `archive_after_days` > 0.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from sqlalchemy import text
+from . import crud, metrics
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_PAUSE = 0.05
+# Pages released per compaction when the file uses incremental auto-vacuum.
+INCREMENTAL_VACUUM_PAGES = 10000
+
+orders_archived = metrics.registry.register(metrics.Counter(
+    "orders_archived_total",
+    "Delivered orders moved to the archive tables.",
+))
+
+_ORDER_FIELDS = "id, customer_name, address, phone, status, total, item_count, created_at, updated_at"
+_ITEM_FIELDS = "id, order_id, menu_item_id, quantity, unit_price"
+
+
+async def _archive_batch(session, cutoff: float, batch_size: int) -> int:
+    result = await session.execute(
+        text("""
+            SELECT id FROM orders
+            WHERE status = 'delivered' AND updated_at < :cutoff
+            ORDER BY id LIMIT :limit
+        """),
+        {"cutoff": cutoff, "limit": batch_size}
+    )
+    order_ids = result.scalars().all()
+    if not order_ids:
+        return 0
+    # The ids are a contiguous slice of the matching rows, so the id range
+    # plus the original predicate selects exactly them.
+    bounds = {"first": order_ids[0], "last": order_ids[-1], "cutoff": cutoff}
+    batch = "status = 'delivered' AND updated_at < :cutoff AND id BETWEEN :first AND :last"
+    await session.execute(text(f"""
+        INSERT INTO order_items_archive ({_ITEM_FIELDS})
+        SELECT {_ITEM_FIELDS} FROM order_items
+        WHERE order_id IN (SELECT id FROM orders WHERE {batch})
+    """), bounds)
+    await session.execute(text(f"""
+        INSERT INTO orders_archive ({_ORDER_FIELDS})
+        SELECT {_ORDER_FIELDS} FROM orders WHERE {batch}
+    """), bounds)
+    await session.execute(text(f"DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE {batch})"), bounds)
+    await session.execute(text(f"DELETE FROM order_changes WHERE order_id IN (SELECT id FROM orders WHERE {batch})"), bounds)
+    await session.execute(text(f"DELETE FROM orders WHERE {batch}"), bounds)
+    return len(order_ids)
+
+
+async def archive_delivered_orders(
+    older_than: float,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    pause: float = ARCHIVE_PAUSE,
+) -> int:
+    """Move delivered orders last updated more than `older_than` seconds
+    ago to the archive tables, `batch_size` orders per transaction.
+    Returns the number of orders moved."""
+    cutoff = time.time() - older_than
+    moved = 0
+    while True:
+        count = await crud.run_write(lambda session: _archive_batch(session, cutoff, batch_size))
+        moved += count
+        orders_archived.inc(count)
+        if count < batch_size:
+            break
+        await asyncio.sleep(pause)
+    if moved:
+        logger.info("Archived delivered orders", extra={"orders": moved})
+    return moved
+
+
+def _compact(sync_conn):
+    # Straight on the driver connection: the writer engine wraps every
+    # SQLAlchemy transaction in BEGIN IMMEDIATE, and a checkpoint can't
+    # truncate the WAL from inside a transaction.
+    cursor = sync_conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] == 2:  # INCREMENTAL
+            cursor.execute(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})")
+            cursor.fetchall()
+        cursor.execute("PRAGMA optimize")
+    finally:
+        cursor.close()
+
+
+async def compact_database():
+    if engine.dialect.name != "sqlite":
+        return
+    async with engine.connect() as conn:
+        await conn.run_sync(_compact)
+
+
+async def run_archival() -> int:
+    """One archival pass with the configured age and batch size."""
+    moved = await archive_delivered_orders(settings.archive_after_days * 86400, settings.archive_batch_size)
+    if moved:
+        await compact_database()
+    return moved
+
+
+class ArchiveScheduler:
+    """Runs `run_archival` every `interval` seconds in the background."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_archival()
+            except Exception:
+                logger.exception("Order archival failed")
+
+
+scheduler = ArchiveScheduler(settings.archive_interval)
+
+
+async def _cli(args):
+    from .main import prepare_database
+    from .database import read_engine
+    try:
+        await prepare_database()
+        moved = await archive_delivered_orders(args.older_than_days * 86400, args.batch_size)
+        await compact_database()
+        print(json.dumps({"archived": moved}))
+    finally:
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=float, default=settings.archive_after_days)
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    asyncio.run(_cli(parser.parse_args()))
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterable, List, Set, Tuple
+from sqlalchemy import insert, text
+from . import crud
+from .database import ReadSessionLocal
+from .models import OrderEvent
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    order_id: int
+    status: str
+    frame: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Serialize once; every subscriber gets the same SSE frame.
+        data = json.dumps({"order_id": self.order_id, "status": self.status})
+        object.__setattr__(self, "frame", f"id: {self.id}\ndata: {data}\n\n")
+
+
+Dispatch = Callable[[Event], int]
+
+
+class Broker:
+    """Delivers order status events to the local subscription registry and
+    keeps enough history to replay events after a reconnect."""
+
+    def __init__(self, dispatch: Dispatch):
+        self.dispatch = dispatch
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, order_id: int, status: str) -> Event:
+        raise NotImplementedError
+
+    async def publish_many(self, changes: Iterable[Tuple[int, str]]) -> List[Event]:
+        return [await self.publish(order_id, status) for order_id, status in changes]
+
+    async def replay(self, order_id: int, after_id: int) -> List[Event]:
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """Single-process broker. History is a bounded ring buffer, so replay
+    only covers the most recent `history_size` events."""
+
+    def __init__(self, dispatch: Dispatch, history_size: int = 1000):
+        super().__init__(dispatch)
+        self._next_id = 1
+        self._history: Deque[Event] = deque(maxlen=history_size)
+
+    async def publish(self, order_id: int, status: str) -> Event:
+        event = Event(self._next_id, order_id, status)
+        self._next_id += 1
+        self._history.append(event)
+        self.dispatch(event)
+        return event
+
+    async def replay(self, order_id: int, after_id: int) -> List[Event]:
+        return [e for e in self._history if e.order_id == order_id and e.id > after_id]
+
+
+class SQLiteBroker(Broker):
+    """Cross-process broker backed by the order_events table.
+
+    Publishing inserts a row through `crud.run_write`, so it shares the
+    writer connection with checkouts, and dispatches locally right away; a
+    poller in every worker picks up rows written by the other workers. Row
+    ids come from an AUTOINCREMENT key, so they are monotonic across
+    processes.
+    """
+
+    def __init__(self, dispatch: Dispatch, poll_interval: float = 0.1, retention: int = 10000):
+        super().__init__(dispatch)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._last_id = 0
+        self._local_ids: Set[int] = set()
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        async with ReadSessionLocal() as session:
+            result = await session.execute(text("SELECT MAX(id) FROM order_events"))
+            self._last_id = result.scalar() or 0
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        # Signal rather than cancel, so a poll is never interrupted while it
+        # holds a pooled connection.
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+    async def publish(self, order_id: int, status: str) -> Event:
+        async def op(session):
+            result = await session.execute(
+                text("INSERT INTO order_events (order_id, status, created_at) VALUES (:order_id, :status, :created_at) RETURNING id"),
+                {"order_id": order_id, "status": status, "created_at": time.time()}
+            )
+            return result.scalar_one()
+
+        event_id = await crud.run_write(op)
+        return self._dispatch_local(Event(event_id, order_id, status))
+
+    async def publish_many(self, changes: Iterable[Tuple[int, str]]) -> List[Event]:
+        rows = [{"order_id": order_id, "status": status, "created_at": time.time()} for order_id, status in changes]
+        if not rows:
+            return []
+        async def op(session):
+            result = await session.execute(insert(OrderEvent).returning(OrderEvent.id), rows)
+            # Batched RETURNING rows aren't ordered; AUTOINCREMENT ids are.
+            return sorted(result.scalars().all())
+
+        event_ids = await crud.run_write(op)
+        return [
+            self._dispatch_local(Event(event_id, row["order_id"], row["status"]))
+            for event_id, row in zip(event_ids, rows)
+        ]
+
+    def _dispatch_local(self, event: Event) -> Event:
+        if self._task is not None:
+            self._local_ids.add(event.id)
+        self.dispatch(event)
+        return event
+
+    async def replay(self, order_id: int, after_id: int) -> List[Event]:
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                text("SELECT id, order_id, status FROM order_events WHERE order_id = :order_id AND id > :after_id ORDER BY id"),
+                {"order_id": order_id, "after_id": after_id}
+            )
+            return [Event(*row) for row in result.fetchall()]
+
+    async def _poll(self):
+        polls = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            polls += 1
+            # A failed poll (pool timeout, "database is locked") must not end
+            # cross-worker delivery; the next poll picks up from _last_id.
+            try:
+                await self._poll_once(prune=polls % 100 == 0)
+            except Exception:
+                logger.exception("SSE broker poll failed")
+
+    async def _poll_once(self, prune: bool):
+        async with ReadSessionLocal() as session:
+            result = await session.execute(
+                text("SELECT id, order_id, status FROM order_events WHERE id > :last_id ORDER BY id"),
+                {"last_id": self._last_id}
+            )
+            rows = result.fetchall()
+        if prune and self._last_id > self.retention:
+            cutoff = self._last_id - self.retention
+            await crud.run_write(lambda session: session.execute(
+                text("DELETE FROM order_events WHERE id <= :cutoff"), {"cutoff": cutoff}
+            ))
+        for row in rows:
+            self._last_id = row[0]
+            if row[0] in self._local_ids:
+                self._local_ids.discard(row[0])
+                continue
+            self.dispatch(Event(*row))
+
+
+def create_broker(backend: str, dispatch: Dispatch, **options) -> Broker:
+    if backend == "memory":
+        return InProcessBroker(dispatch, history_size=options.get("history_size", 1000))
+    if backend == "sqlite":
+        return SQLiteBroker(
+            dispatch,
+            poll_interval=options.get("poll_interval", 0.1),
+            retention=options.get("retention", 10000),
+        )
+    raise ValueError(f"Unknown SSE broker backend: {backend}")
@@ -0,0 +1,318 @@
+"""Bulk menu catalog import and export.
+
+Imports read CSV or NDJSON incrementally and upsert in batches, so memory
+stays flat regardless of catalog size. Rows that carry an `id` update that
+item (or create it with that id); rows without one create a new item.
+Exports stream the table in the same formats, so an export can be edited
+and imported back.
+
+    python -m app.catalog import menu.csv
+    python -m app.catalog export --format ndjson > menu.ndjson
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional
+from pydantic import ValidationError
+from sqlalchemy import text
+from . import crud, schemas
+from .database import ReadSessionLocal
+
+FORMATS = ("csv", "ndjson")
+FIELDS = ("id", "name", "description", "price", "image_url")
+IMPORT_BATCH_SIZE = 1000
+# Per-row errors reported back from an import; later ones are only counted.
+MAX_REPORTED_ERRORS = 100
+DEFAULT_SEED_FILE = Path(__file__).parent / "fixtures" / "menu.csv"
+
+_UPSERT = text("""
+    INSERT INTO menu_items (id, name, description, price, image_url)
+    VALUES (:id, :name, :description, :price, :image_url)
+    ON CONFLICT (id) DO UPDATE SET
+        name = excluded.name,
+        description = excluded.description,
+        price = excluded.price,
+        image_url = excluded.image_url
+""")
+_INSERT = text("""
+    INSERT INTO menu_items (name, description, price, image_url)
+    VALUES (:name, :description, :price, :image_url)
+""")
+
+
+def format_for(filename: str) -> str:
+    return "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+# --- Parsing --------------------------------------------------------------
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines, keeping line endings."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            yield line.decode("utf-8-sig") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8-sig")
+
+
+# A quoted field left open this many lines is reported as a bad record and
+# the lines after its first are parsed again, so one stray quote can't
+# swallow the rest of the file.
+MAX_RECORD_LINES = 100
+
+
+class _NeedMoreLines(Exception):
+    pass
+
+
+def _more_lines(lines: List[str]) -> Iterator[str]:
+    yield from lines
+    raise _NeedMoreLines
+
+
+class _CSVSplitter:
+    """Turn lines into CSV records exactly as `csv.reader` reads them.
+
+    Lines are buffered until `csv.reader` can finish a record from them; a
+    record that fails to parse comes out as its `csv.Error`.
+    """
+
+    def __init__(self):
+        self.pending: List[str] = []
+
+    def feed(self, line: str) -> List:
+        out = []
+        queue = [line]
+        while queue:
+            self.pending.append(queue.pop(0))
+            try:
+                values = next(csv.reader(_more_lines(self.pending)))
+            except _NeedMoreLines:
+                if len(self.pending) >= MAX_RECORD_LINES:
+                    out.append(csv.Error(f"quoted field not closed within {MAX_RECORD_LINES} lines"))
+                    queue[:0] = self.pending[1:]
+                    self.pending = []
+                continue
+            except csv.Error as exc:
+                values = exc
+            record, self.pending = "".join(self.pending), []
+            if record.strip():
+                out.append(values)
+        return out
+
+    def close(self) -> List:
+        out = []
+        while self.pending:
+            rest = self.pending[1:]
+            self.pending = []
+            out.append(csv.Error("unexpected end of data in quoted field"))
+            for line in rest:
+                out.extend(self.feed(line))
+        return out
+
+
+async def _csv_records(lines: AsyncIterable[str]) -> AsyncIterator:
+    """Yield a dict per CSV row after the header, or the `csv.Error` for a
+    row that couldn't be read (reported by import_menu as a row error)."""
+    header = None
+    splitter = _CSVSplitter()
+
+    async def records():
+        async for line in lines:
+            for record in splitter.feed(line):
+                yield record
+        for record in splitter.close():
+            yield record
+
+    async for values in records():
+        if header is None:
+            if isinstance(values, csv.Error):
+                raise ValueError(f"unreadable CSV header: {values}")
+            header = [name.strip() for name in values]
+        elif isinstance(values, csv.Error):
+            yield values
+        else:
+            yield dict(zip(header, values))
+
+
+async def _ndjson_records(lines: AsyncIterable[str]) -> AsyncIterator[str]:
+    # Lines are decoded in _row, so one malformed line is reported as a row
+    # error instead of aborting the import.
+    async for line in lines:
+        if line.strip():
+            yield line
+
+
+def parse(chunks: AsyncIterable[bytes], fmt: str) -> AsyncIterator:
+    """Yield raw records (CSV dicts or NDJSON lines) from a byte stream."""
+    lines = _lines(chunks)
+    return _csv_records(lines) if fmt == "csv" else _ndjson_records(lines)
+
+
+def _row(record) -> dict:
+    """Validate one record into bind parameters for the upsert."""
+    if isinstance(record, csv.Error):
+        raise record
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    values = {k: (None if v == "" else v) for k, v in record.items() if k in FIELDS}
+    item_id = values.pop("id", None)
+    item = schemas.MenuItemCreate(**values)
+    return {
+        "id": int(item_id) if item_id is not None else None,
+        "name": item.name,
+        "description": item.description or "",
+        "price": str(item.price),
+        "image_url": item.image_url or "",
+    }
+
+
+# --- Import ---------------------------------------------------------------
+
+async def _write_batch(session, rows: List[dict]):
+    upserts = [row for row in rows if row["id"] is not None]
+    inserts = [row for row in rows if row["id"] is None]
+    if upserts:
+        await session.execute(_UPSERT, upserts)
+    if inserts:
+        await session.execute(_INSERT, inserts)
+
+
+async def import_menu(records: AsyncIterable, batch_size: int = IMPORT_BATCH_SIZE):
+    """Upsert menu items from `records`, committing every `batch_size` rows.
+
+    Invalid rows are skipped and reported by their 1-based record number.
+    """
+    imported = 0
+    errors = []
+    error_count = 0
+    batch: List[dict] = []
+
+    async def flush():
+        # One write transaction per batch, queued behind (or grouped with)
+        # checkouts rather than contending with them for the write lock.
+        nonlocal imported, batch
+        if batch:
+            rows, batch = batch, []
+            await crud.run_write(lambda session: _write_batch(session, rows))
+            imported += len(rows)
+
+    number = 0
+    async for record in records:
+        number += 1
+        try:
+            batch.append(_row(record))
+        except (ValidationError, ValueError, TypeError, csv.Error) as exc:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"record": number, "error": str(exc).splitlines()[0] if str(exc) else repr(exc)})
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    if imported:
+        crud.menu_cache.invalidate()
+    return {"imported": imported, "failed": error_count, "errors": errors}
+
+
+async def seed_menu(path: Optional[Path] = None) -> int:
+    """Load the fixture catalog into an empty menu in one transaction.
+
+    The emptiness check runs in the same write transaction, so several
+    workers starting at once seed the menu only once. Returns the number of
+    items inserted (0 if the menu already had items).
+    """
+    path = Path(path or DEFAULT_SEED_FILE)
+    records = parse(_read_file(path), format_for(path.name))
+
+    async def op(session):
+        result = await session.execute(text("SELECT 1 FROM menu_items LIMIT 1"))
+        if result.first() is not None:
+            return 0
+        seeded = 0
+        batch = []
+        async for record in records:
+            batch.append(_row(record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await _write_batch(session, batch)
+                seeded += len(batch)
+                batch = []
+        if batch:
+            await _write_batch(session, batch)
+            seeded += len(batch)
+        return seeded
+
+    seeded = await crud.run_write(op)
+    if not seeded:
+        return 0
+    crud.menu_cache.invalidate()
+    return seeded
+
+
+async def _read_file(path: Path, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+# --- Export ---------------------------------------------------------------
+
+async def export_menu(fmt: str) -> AsyncIterator[bytes]:
+    """Stream every menu item by id as CSV (with a header) or NDJSON."""
+    if fmt == "csv":
+        yield _csv_line(FIELDS)
+    async with ReadSessionLocal() as session:
+        result = await session.stream(text("SELECT id, name, description, price, image_url FROM menu_items ORDER BY id"))
+        async for row in result:
+            item = crud.menu_item_dict(row)
+            if fmt == "csv":
+                yield _csv_line(["" if item[f] is None else item[f] for f in FIELDS])
+            else:
+                yield json.dumps(item).encode() + b"\n"
+
+
+def _csv_line(values: Iterable) -> bytes:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerow(values)
+    return out.getvalue().encode()
+
+
+# --- CLI ------------------------------------------------------------------
+
+async def _cli(args):
+    from .main import prepare_database
+    from .database import engine, read_engine
+    try:
+        await prepare_database()
+        if args.command == "import":
+            fmt = args.format or format_for(args.file)
+            report = await import_menu(parse(_read_file(Path(args.file)), fmt), batch_size=args.batch_size)
+            print(json.dumps(report, indent=2))
+        else:
+            async for chunk in export_menu(args.format or "csv"):
+                sys.stdout.buffer.write(chunk)
+    finally:
+        await engine.dispose()
+        if read_engine is not engine:
+            await read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="upsert menu items from a CSV or NDJSON file")
+    importer.add_argument("file")
+    importer.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    exporter = commands.add_parser("export", help="write the menu to stdout")
+    exporter.add_argument("--format", choices=FORMATS)
+    asyncio.run(_cli(parser.parse_args()))
@@ -0,0 +1,77 @@
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    database_url: str = "sqlite+aiosqlite:///./orders.db"
+    # Optional replica/read URL; on SQLite reads default to a separate
+    # query-only pool on the same file.
+    database_read_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_echo: bool = False
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 20000
+
+    # Encode crud results directly instead of revalidating them against the
+    # route's response_model (see app/responses.py).
+    fast_json: bool = False
+
+    log_level: str = "INFO"
+    log_format: str = "text"
+    # Fraction of per-event SSE debug lines that are actually emitted.
+    sse_log_sample_rate: float = 0.01
+    metrics_enabled: bool = True
+
+    # SSE fan-out backend: "memory" for a single process, "sqlite" to share
+    # events between uvicorn workers through the order_events table.
+    sse_broker: str = "memory"
+    sse_poll_interval: float = 0.1
+    sse_replay_size: int = 1000
+    sse_event_retention: int = 10000
+    # Serve active orders from an in-process projection (app/projection.py).
+    # It only hears about other workers' writes through the SSE broker, so
+    # run with one worker or SSE_BROKER=sqlite when enabling it.
+    active_orders_projection: bool = False
+    # Group commit: order creates and status updates are queued to one
+    # writer task that commits them together, up to max_batch operations or
+    # interval_ms after the first one arrives. Worth it with
+    # sqlite_synchronous=FULL (an fsync per commit); under NORMAL it mostly
+    # adds latency.
+    group_commit_enabled: bool = False
+    group_commit_interval_ms: float = 2.0
+    group_commit_max_batch: int = 64
+    # Admission control for write requests (POST/PUT/PATCH/DELETE under
+    # /api/): a per-client token bucket, then a global concurrency limit
+    # with a short bounded queue. See app/admission.py.
+    admission_enabled: bool = True
+    write_rate_per_client: float = 20.0
+    write_burst_per_client: int = 40
+    max_concurrent_writes: int = 32
+    max_queued_writes: int = 128
+    write_queue_timeout: float = 2.0
+    # Reverse proxies (IPs or CIDRs, comma-separated) whose
+    # X-Forwarded-For/X-Real-IP identify the client for the per-client
+    # limit, e.g. the nginx container's address. Empty trusts no one: a
+    # forwarded header from any other peer is ignored.
+    trusted_proxies: str = ""
+    # Idempotency-Key responses are replayed for this long; the most recent
+    # ones are also kept in an in-process LRU.
+    idempotency_ttl: float = 24 * 3600
+    idempotency_cache_size: int = 10000
+    # CSV or NDJSON catalog loaded into an empty menu at startup; defaults
+    # to app/fixtures/menu.csv.
+    menu_seed_file: str | None = None
+    # Delivered orders untouched for this many days are moved to the archive
+    # tables every archive_interval seconds, archive_batch_size per
+    # transaction (see app/archive.py); 0 disables the background job.
+    archive_after_days: float = 30.0
+    archive_interval: float = 3600.0
+    archive_batch_size: int = 500
+    # Upper bound on how stale another worker's menu cache can be.
+    menu_cache_ttl: float = 30.0
+
+
+settings = Settings()
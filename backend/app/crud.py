@@ -1,188 +1,730 @@
-from .database import AsyncSessionLocal
-from sqlalchemy import text
-from . import schemas
+import re
+import time
+from datetime import datetime, timezone
+from .database import AsyncSessionLocal, ReadSessionLocal
+from sqlalchemy import bindparam, insert, text
+from . import models, responses, schemas
+from .config import settings
+from .idempotency import IdempotencyCache, StoredResponse
+from .menu_cache import MenuCache
+from .projection import ActiveOrders
+from .writer import writer
 
-async def _get_next_id(table: str) -> int:
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(text(f"SELECT MAX(id) FROM {table}"))
-        max_id = result.scalar()
-        return (max_id or 0) + 1
+
+class StatusConflictError(Exception):
+    def __init__(self, order_id: int, current: str, requested: str):
+        self.order_id = order_id
+        self.current = current
+        self.requested = requested
+        super().__init__(f"Order {order_id} is {current} and cannot move to {requested}")
+
+
+class UnknownMenuItemError(Exception):
+    def __init__(self, menu_item_ids):
+        self.menu_item_ids = sorted(menu_item_ids)
+        super().__init__(f"Unknown menu item ids: {self.menu_item_ids}")
+
+
+def menu_item_dict(row):
+    """Menu item response dict from an (id, name, description, price,
+    image_url) row; also used by catalog exports."""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "description": row[2] if row[2] else None,
+        "price": float(row[3]),
+        "image_url": row[4] if row[4] else None
+    }
+
+
+async def _fetch_menu_items(session, menu_item_ids):
+    result = await session.execute(
+        text("SELECT id, name, description, price, image_url FROM menu_items WHERE id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(menu_item_ids)}
+    )
+    return {row[0]: menu_item_dict(row) for row in result.fetchall()}
 
 async def create_menu_item(item: schemas.MenuItemCreate):
-    item_id = await _get_next_id("menu_items")
-    async with AsyncSessionLocal() as session:
-        await session.execute(
-            text("INSERT INTO menu_items (id, name, description, price, image_url) VALUES (:id, :name, :description, :price, :image_url)"),
+    async def op(session):
+        result = await session.execute(
+            text("INSERT INTO menu_items (name, description, price, image_url) VALUES (:name, :description, :price, :image_url) RETURNING id"),
             {
-                "id": item_id,
                 "name": item.name,
                 "description": item.description or "",
                 "price": str(item.price),
                 "image_url": item.image_url or ""
             }
         )
-        await session.commit()
-    return await get_menu_item(item_id)
+        return result.scalar_one()
 
-async def get_all_menu_items_():
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(text("SELECT * FROM menu_items"))
+    item_id = await run_write(op)
+    menu_cache.invalidate()
+    return {
+        "id": item_id,
+        "name": item.name,
+        "description": item.description or None,
+        "price": float(item.price),
+        "image_url": item.image_url or None
+    }
+
+async def _load_menu_items():
+    async with ReadSessionLocal() as session:
+        result = await session.execute(text("SELECT id, name, description, price, image_url FROM menu_items ORDER BY id"))
         rows = result.fetchall()
-        return [
-            {
-                "id": row[0],
-                "name": row[1],
-                "description": row[2] if row[2] else None,
-                "price": float(row[3]),
-                "image_url": row[4] if row[4] else None
-            }
-            for row in rows
-        ]
+        return [menu_item_dict(row) for row in rows]
+
+_SEARCH_TERM = re.compile(r"\w+")
+# `rank` is bm25 with name hits weighted over description hits (migration
+# 8). Every match is ranked, so a strong match is found however many weaker
+# ones the query also hits.
+_RANKED_SEARCH = text("""
+    SELECT mi.id, mi.name, mi.description, mi.price, mi.image_url
+    FROM (
+        SELECT rowid, rank FROM menu_items_fts
+        WHERE menu_items_fts MATCH :query
+        ORDER BY rank
+        LIMIT :limit
+    ) ranked
+    JOIN menu_items mi ON mi.id = ranked.rowid
+    ORDER BY ranked.rank
+""")
+
+def _fts_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last
+    as a prefix so results update while the user types."""
+    terms = _SEARCH_TERM.findall(q)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+async def search_menu_items(q: str, limit: int = 20):
+    query = _fts_query(q)
+    if not query:
+        return []
+    async with ReadSessionLocal() as session:
+        if session.bind.dialect.name != "sqlite":
+            # No FTS index outside SQLite; plain substring match on the name.
+            result = await session.execute(
+                text("SELECT id, name, description, price, image_url FROM menu_items WHERE LOWER(name) LIKE :pattern ORDER BY name LIMIT :limit"),
+                {"pattern": f"%{q.strip().lower()}%", "limit": limit}
+            )
+            rows = result.fetchall()
+        else:
+            result = await session.execute(_RANKED_SEARCH, {"query": query, "limit": limit})
+            rows = result.fetchall()
+        return [menu_item_dict(row) for row in rows]
+
+menu_cache = MenuCache(_load_menu_items, ttl=settings.menu_cache_ttl)
+
+async def get_menu_snapshot():
+    return await menu_cache.get()
+
+async def get_all_menu_items_():
+    return (await menu_cache.get()).items
 
 async def get_menu_item(item_id: int):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            text("SELECT * FROM menu_items WHERE id = :id"),
-            {"id": item_id}
-        )
-        row = result.fetchone()
-        if not row:
-            return None
-        return {
-            "id": row[0],
-            "name": row[1],
-            "description": row[2] if row[2] else None,
-            "price": float(row[3]),
-            "image_url": row[4] if row[4] else None
-        }
+    return (await menu_cache.get()).by_id.get(item_id)
 
 async def get_menu_item_(item_id: int):
     return await get_menu_item(item_id)
 
-async def get_all_orders_():
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(text("""
-            SELECT o.id, o.customer_name, o.address, o.phone, o.status,
-                   oi.id as order_item_id, oi.menu_item_id, oi.quantity,
-                   mi.name, mi.description, mi.price, mi.image_url
-            FROM orders o
-            LEFT JOIN order_items oi ON o.id = oi.order_id
-            LEFT JOIN menu_items mi ON oi.menu_item_id = mi.id
-            ORDER BY o.id, oi.id
-        """))
-        rows = result.fetchall()
-        orders_dict = {}
-        for row in rows:
-            order_id = row[0]
-            if order_id not in orders_dict:
-                orders_dict[order_id] = {
-                    "id": order_id,
-                    "customer_name": row[1],
-                    "address": row[2],
-                    "phone": row[3],
-                    "status": row[4],
-                    "items": []
-                }
-            if row[5] is not None:  # order_item_id exists
-                orders_dict[order_id]["items"].append({
-                    "id": row[5],
-                    "menu_item_id": row[6],
-                    "quantity": row[7],
-                    "menu_item": {
-                        "id": row[6],
-                        "name": row[8],
-                        "description": row[9],
-                        "price": float(row[10]) if row[10] else 0.0,
-                        "image_url": row[11]
-                    }
-                })
-        return list(orders_dict.values())
+ORDER_PAGE_SIZE = 100
+
+# Columns for a fully expanded order; rows are grouped by _group_order_rows.
+_ORDER_COLUMNS = """
+    o.id, o.customer_name, o.address, o.phone, o.status, o.total, o.item_count,
+    oi.id as order_item_id, oi.menu_item_id, oi.quantity, oi.unit_price,
+    mi.name as menu_name, mi.description as menu_description,
+    mi.price as menu_price, mi.image_url as menu_image_url
+"""
+
+# List views only read the orders table.
+_SUMMARY_COLUMNS = "id, customer_name, status, total, item_count"
+
+def _order_summary_dict(row):
+    return {
+        "id": row[0],
+        "customer_name": row[1],
+        "status": row[2],
+        "total": row[3],
+        "item_count": row[4]
+    }
+
+def _order_dict(row):
+    return {
+        "id": row[0],
+        "customer_name": row[1],
+        "address": row[2],
+        "phone": row[3],
+        "status": row[4],
+        "total": row[5],
+        "item_count": row[6],
+        "items": []
+    }
+
+def _order_item_dict(row):
+    return {
+        "id": row[7],
+        "menu_item_id": row[8],
+        "quantity": row[9],
+        "unit_price": row[10],
+        "menu_item": {
+            "id": row[8],
+            "name": row[11],
+            "description": row[12] if row[12] else None,
+            "price": float(row[13]) if row[13] else 0.0,
+            "image_url": row[14] if row[14] else None
+        }
+    }
+
+def _group_order_rows(rows):
+    """Fold joined rows, ordered by order id, into order dicts."""
+    current = None
+    for row in rows:
+        if current is None or current["id"] != row[0]:
+            if current is not None:
+                yield current
+            current = _order_dict(row)
+        if row[7] is not None:  # order_item_id exists
+            current["items"].append(_order_item_dict(row))
+    if current is not None:
+        yield current
+
+def _orders_filter(after_id, statuses, order_ids=None, descending=False):
+    if descending:
+        clauses = ["id < :after_id"] if after_id is not None else []
+    else:
+        clauses = ["id > :after_id"]
+    params = {"after_id": after_id or 0}
+    if order_ids is not None:
+        clauses.append("id IN :order_ids")
+        params["order_ids"] = list(order_ids)
+    if statuses:
+        clauses.append("status IN :statuses")
+        params["statuses"] = [getattr(s, "value", s) for s in statuses]
+    return " AND ".join(clauses) or "1", params
+
+def _orders_query(where: str, limited: bool, statuses, order_ids=None, descending=False):
+    stmt = text(f"""
+        SELECT {_SUMMARY_COLUMNS} FROM orders
+        WHERE {where} ORDER BY id {"DESC" if descending else ""} {"LIMIT :limit" if limited else ""}
+    """)
+    if statuses:
+        stmt = stmt.bindparams(bindparam("statuses", expanding=True))
+    if order_ids is not None:
+        stmt = stmt.bindparams(bindparam("order_ids", expanding=True))
+    return stmt
+
+async def get_orders_page(after_id: int | None = None, statuses=None, limit: int = ORDER_PAGE_SIZE, descending: bool = False):
+    """Return up to `limit` order summaries with id > after_id (id <
+    after_id, newest first, when `descending`), plus the cursor for the next
+    page (None when this is the last one)."""
+    where, params = _orders_filter(after_id, statuses, descending=descending)
+    params["limit"] = limit + 1
+    async with ReadSessionLocal() as session:
+        result = await session.execute(_orders_query(where, True, statuses, descending=descending), params)
+        orders = [_order_summary_dict(row) for row in result.fetchall()]
+    if len(orders) > limit:
+        orders = orders[:limit]
+        return orders, orders[-1]["id"]
+    return orders, None
+
+async def stream_orders(after_id: int | None = None, statuses=None, limit: int | None = None, descending: bool = False):
+    """Yield order summaries one at a time while the result cursor is consumed."""
+    where, params = _orders_filter(after_id, statuses, descending=descending)
+    if limit is not None:
+        params["limit"] = limit
+    async with ReadSessionLocal() as session:
+        result = await session.stream(_orders_query(where, limit is not None, statuses, descending=descending), params)
+        async for row in result:
+            yield _order_summary_dict(row)
+
+async def get_order_summaries(order_ids=None, statuses=None):
+    """Unpaged summaries for the given ids and/or statuses, used as the
+    snapshot that starts a multiplexed SSE stream."""
+    where, params = _orders_filter(None, statuses, order_ids)
+    async with ReadSessionLocal() as session:
+        result = await session.execute(_orders_query(where, False, statuses, order_ids), params)
+        return [_order_summary_dict(row) for row in result.fetchall()]
+
+def _order_by_id(orders_table: str, items_table: str):
+    return text(f"""
+        SELECT {_ORDER_COLUMNS}
+        FROM {orders_table} o
+        LEFT JOIN {items_table} oi ON o.id = oi.order_id
+        LEFT JOIN menu_items mi ON oi.menu_item_id = mi.id
+        WHERE o.id = :id
+        ORDER BY oi.id
+    """)
 
 async def get_order(order_id: int):
-    async with AsyncSessionLocal() as session:
+    """Read an order from the live tables, falling back to the archive for
+    delivered orders moved there by app/archive.py."""
+    async with ReadSessionLocal() as session:
+        result = await session.execute(_order_by_id("orders", "order_items"), {"id": order_id})
+        order = next(_group_order_rows(result.fetchall()), None)
+        if order is None:
+            result = await session.execute(_order_by_id("orders_archive", "order_items_archive"), {"id": order_id})
+            order = next(_group_order_rows(result.fetchall()), None)
+        return order
+
+active_orders = ActiveOrders()
+ACTIVE_STATUSES = [s.value for s in models.OrderStatus if s is not models.OrderStatus.delivered]
+
+async def load_active_orders():
+    async with ReadSessionLocal() as session:
         result = await session.execute(
-            text("""
-                SELECT o.id, o.customer_name, o.address, o.phone, o.status,
-                       oi.id as order_item_id, oi.menu_item_id, oi.quantity,
-                       mi.name as menu_name, mi.description as menu_description, 
-                       mi.price as menu_price, mi.image_url as menu_image_url
+            text(f"""
+                SELECT {_ORDER_COLUMNS}
                 FROM orders o
                 LEFT JOIN order_items oi ON o.id = oi.order_id
                 LEFT JOIN menu_items mi ON oi.menu_item_id = mi.id
-                WHERE o.id = :id
-                ORDER BY oi.id
-            """),
-            {"id": order_id}
+                WHERE o.status IN :statuses
+                ORDER BY o.id, oi.id
+            """).bindparams(bindparam("statuses", expanding=True)),
+            {"statuses": ACTIVE_STATUSES}
         )
-        rows = result.fetchall()
-        if not rows:
-            return None
-        
-        order_data = {
-            "id": rows[0][0],
-            "customer_name": rows[0][1],
-            "address": rows[0][2],
-            "phone": rows[0][3],
-            "status": rows[0][4],
-            "items": []
-        }
-        
-        for row in rows:
-            if row[5] is not None:  # order_item_id exists
-                order_data["items"].append({
-                    "id": row[5],
-                    "menu_item_id": row[6],
-                    "quantity": row[7],
-                    "menu_item": {
-                        "id": row[6],
-                        "name": row[8],
-                        "description": row[9],
-                        "price": float(row[10]) if row[10] else 0.0,
-                        "image_url": row[11]
-                    }
-                })
-        
-        return order_data
+        return list(_group_order_rows(result.fetchall()))
 
 async def get_order_(order_id: int):
+    """get_order, answered from the active-orders projection when it holds
+    the order."""
+    order = active_orders.get(order_id)
+    if order is not None:
+        return order
     return await get_order(order_id)
 
-async def create_order(order: schemas.OrderCreate):
-    order_id = await _get_next_id("orders")
-    async with AsyncSessionLocal() as session:
-        await session.execute(
-            text("INSERT INTO orders (id, customer_name, address, phone, status) VALUES (:id, :customer_name, :address, :phone, :status)"),
+async def get_active_orders(statuses=None):
+    """Summaries of orders not yet delivered, optionally narrowed to
+    `statuses`, by ascending id."""
+    if active_orders.loaded:
+        return active_orders.summaries(statuses)
+    statuses = [getattr(s, "value", s) for s in statuses] if statuses else ACTIVE_STATUSES
+    return await get_order_summaries(statuses=statuses)
+
+async def _record_changes(session, changes):
+    now = time.time()
+    await session.execute(
+        insert(models.OrderChange),
+        [{"order_id": order_id, "status": status, "changed_at": now} for order_id, status in changes]
+    )
+
+async def get_order_changes(since: int = 0, limit: int = ORDER_PAGE_SIZE):
+    """Summaries of orders changed after cursor `since`, oldest change first,
+    plus the cursor to pass next time. An order that changed more than once
+    in the page appears once, at its latest change, with its current state."""
+    async with ReadSessionLocal() as session:
+        result = await session.execute(
+            text("""
+                SELECT c.id, o.id, o.customer_name, o.status, o.total, o.item_count
+                FROM order_changes c
+                JOIN orders o ON o.id = c.order_id
+                WHERE c.id > :since
+                ORDER BY c.id
+                LIMIT :limit
+            """),
+            {"since": since, "limit": limit}
+        )
+        rows = result.fetchall()
+    latest = {}
+    for row in rows:
+        latest.pop(row[1], None)
+        latest[row[1]] = row
+    orders = [dict(_order_summary_dict(row[1:]), seq=row[0]) for row in latest.values()]
+    return orders, rows[-1][0] if rows else since
+
+# Sales rollups: sales_item_hourly and sales_hourly are bumped in the same
+# transaction as each checkout and delivery, bucketed by checkout hour.
+# app/analytics.py rebuilds them from the raw orders with the same selects.
+_SALES_COLUMNS = ("order_count", "quantity", "revenue", "delivered_orders", "delivered_revenue")
+_SALES_HOUR = "CAST(COALESCE(o.created_at, o.updated_at, 0) / 3600 AS INTEGER) * 3600"
+_DELIVERED = "o.status = 'delivered'"
+
+def _sales_hour(timestamp: float) -> int:
+    return int(timestamp // 3600) * 3600
+
+def sales_upsert(table: str, keys: str, source: str) -> str:
+    """INSERT `source` rows into a rollup table, adding to existing counters."""
+    accumulate = ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in _SALES_COLUMNS)
+    return f"""
+        INSERT INTO {table} ({keys}, {", ".join(_SALES_COLUMNS)})
+        {source}
+        ON CONFLICT ({keys}) DO UPDATE SET {accumulate}
+    """
+
+def item_sales_select(orders_table: str, items_table: str, where: str, delivery_only: bool = False) -> str:
+    """Per item and hour sales of the orders matching `where` (alias o, with
+    items as oi), in sales_upsert column order."""
+    line = "oi.quantity * COALESCE(oi.unit_price, 0)"
+    checkout = "0, 0, 0" if delivery_only else f"COUNT(DISTINCT o.id), SUM(oi.quantity), SUM({line})"
+    return f"""
+        SELECT oi.menu_item_id, {_SALES_HOUR} AS hour, {checkout},
+               COUNT(DISTINCT CASE WHEN {_DELIVERED} THEN o.id END),
+               COALESCE(SUM(CASE WHEN {_DELIVERED} THEN {line} END), 0)
+        FROM {orders_table} o JOIN {items_table} oi ON oi.order_id = o.id
+        WHERE {where}
+        GROUP BY oi.menu_item_id, hour
+    """
+
+def hourly_sales_select(orders_table: str, where: str, delivery_only: bool = False) -> str:
+    """Per hour sales of the orders matching `where` (alias o)."""
+    checkout = "0, 0, 0" if delivery_only else "COUNT(*), SUM(o.item_count), SUM(o.total)"
+    return f"""
+        SELECT {_SALES_HOUR} AS hour, {checkout},
+               COUNT(CASE WHEN {_DELIVERED} THEN 1 END),
+               COALESCE(SUM(CASE WHEN {_DELIVERED} THEN o.total END), 0)
+        FROM {orders_table} o
+        WHERE {where}
+        GROUP BY hour
+    """
+
+def _sales_values(keys: str) -> str:
+    return "VALUES (" + ", ".join(f":{c}" for c in (*keys.split(", "), *_SALES_COLUMNS)) + ")"
+
+_ITEM_SALES_UPSERT = text(sales_upsert("sales_item_hourly", "menu_item_id, hour", _sales_values("menu_item_id, hour")))
+_HOURLY_SALES_UPSERT = text(sales_upsert("sales_hourly", "hour", _sales_values("hour")))
+_ITEM_DELIVERY_UPSERT = text(sales_upsert(
+    "sales_item_hourly", "menu_item_id, hour",
+    item_sales_select("orders", "order_items", "o.id = :id", delivery_only=True)
+))
+_HOURLY_DELIVERY_UPSERT = text(sales_upsert(
+    "sales_hourly", "hour", hourly_sales_select("orders", "o.id = :id", delivery_only=True)
+))
+
+async def _record_sales(session, orders, totals, menu_items, now: float):
+    """Add freshly inserted orders to the current hour's rollups."""
+    hour = _sales_hour(now)
+    by_item = {}
+    for order in orders:
+        quantities = {}
+        for item in order.items:
+            quantities[item.menu_item_id] = quantities.get(item.menu_item_id, 0) + item.quantity
+        for menu_item_id, quantity in quantities.items():
+            row = by_item.setdefault(menu_item_id, {
+                "menu_item_id": menu_item_id, "hour": hour, "order_count": 0, "quantity": 0,
+                "revenue": 0.0, "delivered_orders": 0, "delivered_revenue": 0.0,
+            })
+            row["order_count"] += 1
+            row["quantity"] += quantity
+            row["revenue"] += quantity * menu_items[menu_item_id]["price"]
+    await session.execute(_ITEM_SALES_UPSERT, list(by_item.values()))
+    await session.execute(_HOURLY_SALES_UPSERT, {
+        "hour": hour,
+        "order_count": len(orders),
+        "quantity": sum(item.quantity for order in orders for item in order.items),
+        "revenue": sum(totals),
+        "delivered_orders": 0,
+        "delivered_revenue": 0.0,
+    })
+
+async def _record_delivery(session, order_id: int):
+    """Count a just-delivered order in the rollups of its checkout hour."""
+    await session.execute(_ITEM_DELIVERY_UPSERT, {"id": order_id})
+    await session.execute(_HOURLY_DELIVERY_UPSERT, {"id": order_id})
+
+async def get_sales(start: float | None = None, end: float | None = None,
+                    menu_item_id: int | None = None, group_by: str = "item_hour"):
+    """Sales from the rollups for checkout hours in [start, end), per item
+    and hour, per item, or per hour. `start` is rounded down to its hour."""
+    clauses, params = [], {}
+    if start is not None:
+        clauses.append("s.hour >= :start")
+        params["start"] = _sales_hour(start)
+    if end is not None:
+        clauses.append("s.hour < :end")
+        params["end"] = end
+    if menu_item_id is not None:
+        clauses.append("s.menu_item_id = :menu_item_id")
+        params["menu_item_id"] = menu_item_id
+    where = " AND ".join(clauses) or "1 = 1"
+    totals = ", ".join(f"SUM(s.{c})" for c in _SALES_COLUMNS)
+    if group_by == "hour" and menu_item_id is None:
+        query = f"SELECT s.hour, NULL, NULL, {totals} FROM sales_hourly s WHERE {where} GROUP BY s.hour ORDER BY s.hour"
+    elif group_by == "hour":
+        query = f"SELECT s.hour, NULL, NULL, {totals} FROM sales_item_hourly s WHERE {where} GROUP BY s.hour ORDER BY s.hour"
+    elif group_by == "item":
+        query = f"""
+            SELECT NULL, s.menu_item_id, mi.name, {totals}
+            FROM sales_item_hourly s LEFT JOIN menu_items mi ON mi.id = s.menu_item_id
+            WHERE {where} GROUP BY s.menu_item_id, mi.name ORDER BY SUM(s.revenue) DESC, s.menu_item_id
+        """
+    else:
+        query = f"""
+            SELECT s.hour, s.menu_item_id, mi.name, {", ".join(f"s.{c}" for c in _SALES_COLUMNS)}
+            FROM sales_item_hourly s LEFT JOIN menu_items mi ON mi.id = s.menu_item_id
+            WHERE {where} ORDER BY s.hour, s.menu_item_id
+        """
+    async with ReadSessionLocal() as session:
+        result = await session.execute(text(query), params)
+        return [_sales_dict(row) for row in result.fetchall()]
+
+def _iso_hour(hour: int) -> str:
+    # Wire format, as pydantic renders a UTC datetime.
+    return datetime.fromtimestamp(hour, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _sales_dict(row):
+    return {
+        "hour": _iso_hour(row[0]) if row[0] is not None else None,
+        "menu_item_id": row[1],
+        "menu_item_name": row[2],
+        "order_count": row[3],
+        "quantity": row[4],
+        "revenue": round(row[5], 2),
+        "delivered_orders": row[6],
+        "delivered_revenue": round(row[7], 2),
+    }
+
+async def _insert_orders(session, orders, menu_items):
+    """Insert already-validated orders and their items with one batched
+    statement per table; returns the response dicts in input order.
+
+    Each line captures the menu price at checkout, and the order row stores
+    the resulting total and item count for list views.
+
+    Core inserts render multi-row INSERT ... RETURNING. New rowids are handed
+    out in VALUES order, so sorting the returned ids lines them back up with
+    the input rows.
+    """
+    now = time.time()
+    totals = [
+        round(sum(menu_items[item.menu_item_id]["price"] * item.quantity for item in order.items), 2)
+        for order in orders
+    ]
+    result = await session.execute(
+        insert(models.Order).returning(models.Order.id),
+        [
             {
-                "id": order_id,
                 "customer_name": order.customer_name,
                 "address": order.address,
                 "phone": order.phone,
-                "status": "received"
+                "status": models.OrderStatus.received,
+                "total": total,
+                "item_count": sum(item.quantity for item in order.items),
+                "created_at": now,
+                "updated_at": now
             }
-        )
-        for item in order.items:
-            await session.execute(
-                text("INSERT INTO order_items (order_id, menu_item_id, quantity) VALUES (:order_id, :menu_item_id, :quantity)"),
+            for order, total in zip(orders, totals)
+        ]
+    )
+    order_ids = sorted(result.scalars().all())
+    item_rows = [
+        {
+            "order_id": order_id,
+            "menu_item_id": item.menu_item_id,
+            "quantity": item.quantity,
+            "unit_price": menu_items[item.menu_item_id]["price"]
+        }
+        for order_id, order in zip(order_ids, orders)
+        for item in order.items
+    ]
+    result = await session.execute(insert(models.OrderItem).returning(models.OrderItem.id), item_rows)
+    item_ids = iter(sorted(result.scalars().all()))
+    await _record_changes(session, [(order_id, models.OrderStatus.received.value) for order_id in order_ids])
+    await _record_sales(session, orders, totals, menu_items, now)
+    return [
+        {
+            "id": order_id,
+            "customer_name": order.customer_name,
+            "address": order.address,
+            "phone": order.phone,
+            "status": "received",
+            "total": total,
+            "item_count": sum(item.quantity for item in order.items),
+            "items": [
                 {
-                    "order_id": order_id,
+                    "id": next(item_ids),
                     "menu_item_id": item.menu_item_id,
-                    "quantity": item.quantity
+                    "quantity": item.quantity,
+                    "unit_price": menu_items[item.menu_item_id]["price"],
+                    "menu_item": menu_items[item.menu_item_id]
                 }
-            )
+                for item in order.items
+            ]
+        }
+        for order_id, order, total in zip(order_ids, orders, totals)
+    ]
+
+async def run_write(op):
+    """Run `op(session)` in a write transaction and return its result once
+    committed: queued to the group-commit writer when it is running,
+    otherwise in a transaction of its own. Every write to the database
+    should go through here so it shares the single writer connection."""
+    if writer.running:
+        return await writer.submit(op)
+    async with AsyncSessionLocal() as session:
+        result = await op(session)
         await session.commit()
-    return await get_order(order_id)
+    return result
+
+async def _create_order_in(session, order: schemas.OrderCreate):
+    menu_item_ids = {item.menu_item_id for item in order.items}
+    menu_items = await _fetch_menu_items(session, menu_item_ids)
+    missing = menu_item_ids - menu_items.keys()
+    if missing:
+        raise UnknownMenuItemError(missing)
+    created = await _insert_orders(session, [order], menu_items)
+    return created[0]
+
+async def create_order(order: schemas.OrderCreate):
+    """Create an order and its items in a single transaction.
+
+    Ids are assigned by the database, and the response is built from the
+    rows just written plus the referenced menu items, so no re-read is needed.
+    """
+    created = await run_write(lambda session: _create_order_in(session, order))
+    active_orders.add(created)
+    return created
+
+idempotency_cache = IdempotencyCache(settings.idempotency_cache_size, settings.idempotency_ttl)
+# Expired keys are deleted in chunks, every this many key writes.
+IDEMPOTENCY_PRUNE_EVERY = 1000
+_idempotency_writes = 0
+
+async def _fetch_idempotency_key(session, key: str):
+    result = await session.execute(
+        text("""
+            SELECT request_hash, status_code, body, created_at FROM idempotency_keys
+            WHERE key = :key AND created_at >= :cutoff
+        """),
+        {"key": key, "cutoff": time.time() - idempotency_cache.ttl}
+    )
+    row = result.fetchone()
+    return StoredResponse(row[0], row[1], bytes(row[2]), row[3]) if row else None
+
+async def _prune_idempotency_keys(session):
+    global _idempotency_writes
+    _idempotency_writes += 1
+    if _idempotency_writes % IDEMPOTENCY_PRUNE_EVERY:
+        return
+    await session.execute(
+        text("""
+            DELETE FROM idempotency_keys WHERE key IN (
+                SELECT key FROM idempotency_keys WHERE created_at < :cutoff LIMIT :chunk
+            )
+        """),
+        {"cutoff": time.time() - idempotency_cache.ttl, "chunk": IDEMPOTENCY_PRUNE_EVERY * 10}
+    )
+
+async def get_idempotent_response(key: str):
+    """Stored response for `key` from the LRU or the table, if still live."""
+    stored = idempotency_cache.get(key)
+    if stored is None:
+        async with ReadSessionLocal() as session:
+            stored = await _fetch_idempotency_key(session, key)
+        if stored is not None:
+            idempotency_cache.put(key, stored)
+    return stored
+
+async def create_order_idempotent(order: schemas.OrderCreate, key: str, request_hash: str):
+    """create_order, with the response recorded under `key` in the same
+    transaction. Returns (stored response, created order); the order is None
+    when the key already had a response, e.g. a concurrent retry won."""
+    async def op(session):
+        stored = await _fetch_idempotency_key(session, key)
+        if stored is not None:
+            return stored, None
+        created = await _create_order_in(session, order)
+        stored = StoredResponse(request_hash, 201, responses.dumps(created), time.time())
+        # An expired row for the same key may still be present.
+        await session.execute(
+            text("""
+                INSERT INTO idempotency_keys (key, request_hash, status_code, body, created_at)
+                VALUES (:key, :request_hash, :status_code, :body, :created_at)
+                ON CONFLICT (key) DO UPDATE SET
+                    request_hash = excluded.request_hash,
+                    status_code = excluded.status_code,
+                    body = excluded.body,
+                    created_at = excluded.created_at
+            """),
+            {"key": key, "request_hash": request_hash, "status_code": stored.status_code, "body": stored.body, "created_at": stored.created_at}
+        )
+        await _prune_idempotency_keys(session)
+        return stored, created
+
+    stored, created = await run_write(op)
+    idempotency_cache.put(key, stored)
+    if created is not None:
+        active_orders.add(created)
+    return stored, created
+
+async def create_orders_batch(orders):
+    """Create many orders in one transaction.
+
+    Menu item ids for the whole batch are validated with a single query.
+    Orders referencing unknown items are reported as errors and skipped;
+    the rest are inserted. Returns one result dict per input, in order.
+    """
+    menu_item_ids = {item.menu_item_id for order in orders for item in order.items}
+
+    async def op(session):
+        results = [None] * len(orders)
+        menu_items = await _fetch_menu_items(session, menu_item_ids)
+        valid = []
+        for index, order in enumerate(orders):
+            missing = {item.menu_item_id for item in order.items} - menu_items.keys()
+            if missing:
+                results[index] = {"index": index, "order": None, "error": str(UnknownMenuItemError(missing))}
+            else:
+                valid.append(index)
+        if valid:
+            created = await _insert_orders(session, [orders[i] for i in valid], menu_items)
+            for index, order_data in zip(valid, created):
+                results[index] = {"index": index, "order": order_data, "error": None}
+        return results
+
+    results = await run_write(op)
+    for result in results:
+        if result["order"] is not None:
+            active_orders.add(result["order"])
+    return results
 
 async def update_order_(order_id: int, order_update: schemas.OrderUpdate):
-    if order_update.status:
-        async with AsyncSessionLocal() as session:
-            await session.execute(
-                text("UPDATE orders SET status = :status WHERE id = :id"),
-                {"status": order_update.status, "id": order_id}
+    """Compare-and-set the order status along ALLOWED_TRANSITIONS.
+
+    The happy path is one conditional UPDATE ... RETURNING the new summary.
+    Returns None for an unknown order and raises StatusConflictError when
+    the order isn't in the status the transition starts from (or in
+    `expected_status`, if the client sent one).
+    """
+    status = models.OrderStatus(order_update.status)
+    previous = models.PREVIOUS_STATUS.get(status)
+    expected = order_update.expected_status
+
+    async def op(session):
+        if previous is not None and (expected is None or expected == previous):
+            result = await session.execute(
+                text(f"""
+                    UPDATE orders SET status = :status, updated_at = :now
+                    WHERE id = :id AND status = :previous
+                    RETURNING {_SUMMARY_COLUMNS}
+                """),
+                {"status": status.value, "previous": previous.value, "id": order_id, "now": time.time()}
             )
-            await session.commit()
-    return await get_order(order_id)
+            row = result.fetchone()
+            if row is not None:
+                await _record_changes(session, [(order_id, status.value)])
+                if status is models.OrderStatus.delivered:
+                    await _record_delivery(session, order_id)
+                return row, None
+        result = await session.execute(text("SELECT status FROM orders WHERE id = :id"), {"id": order_id})
+        return None, result.scalar()
+
+    row, current = await run_write(op)
+    if row is not None:
+        active_orders.set_status(order_id, status.value)
+        return _order_summary_dict(row)
+    if current is None:
+        return None
+    raise StatusConflictError(order_id, current, status.value)
 
 async def notify_order_status_change(order_id: int, status: str):
     from .sse import notify_subscribers
     await notify_subscribers(order_id, status)
 
+async def notify_orders_created(order_ids):
+    from .sse import notify_subscribers_many
+    await notify_subscribers_many([(order_id, models.OrderStatus.received.value) for order_id in order_ids])
+
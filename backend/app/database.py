@@ -1,20 +1,95 @@
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from .config import settings
 
-# Use SQLite for simplicity
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./orders.db"
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_sqlite_file(url: str) -> bool:
+    return _is_sqlite(url) and ":memory:" not in url and not url.rstrip("/").endswith(":")
+
+def _sqlite_pragmas(read_only: bool):
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+def _sqlite_explicit_transactions(sync_engine):
+    # The sqlite3 driver defers BEGIN until the first DML statement, so a
+    # SAVEPOINT issued first opens (and its RELEASE commits) the whole
+    # transaction. Take over transaction control so nested transactions
+    # work; IMMEDIATE takes the write lock up front, which also makes
+    # writers from other processes wait on busy_timeout instead of failing
+    # on a lock upgrade.
+    @event.listens_for(sync_engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _create_engine(url: str, pool_size: int, max_overflow: int, read_only: bool = False):
+    options = {"echo": settings.db_echo, "future": True}
+    if not _is_sqlite(url) or _is_sqlite_file(url):
+        # aiosqlite defaults to NullPool (a new connection per session), which
+        # would rerun the connect pragmas every time; keep connections pooled.
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    new_engine = create_async_engine(url, **options)
+    if _is_sqlite_file(url):
+        event.listen(new_engine.sync_engine, "connect", _sqlite_pragmas(read_only))
+        if not read_only:
+            _sqlite_explicit_transactions(new_engine.sync_engine)
+    return new_engine
+
+if _is_sqlite_file(SQLALCHEMY_DATABASE_URL):
+    # SQLite allows one writer at a time: funnel writes through a single
+    # connection and let readers use their own WAL snapshots in parallel.
+    engine = _create_engine(SQLALCHEMY_DATABASE_URL, pool_size=1, max_overflow=0)
+    read_engine = _create_engine(
+        settings.database_read_url or SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        read_only=True,
+    )
+else:
+    engine = _create_engine(SQLALCHEMY_DATABASE_URL, settings.db_pool_size, settings.db_max_overflow)
+    read_engine = (
+        _create_engine(settings.database_read_url, settings.db_pool_size, settings.db_max_overflow)
+        if settings.database_read_url else engine
+    )
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, echo=False, future=True
-)
 AsyncSessionLocal = sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
+ReadSessionLocal = sessionmaker(
+    bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
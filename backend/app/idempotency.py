@@ -0,0 +1,61 @@
+"""Idempotency-Key support for order creation.
+
+The first response for a key is stored in the idempotency_keys table, in
+the same transaction as the order, and kept in a bounded in-process LRU.
+Repeats within the TTL are answered from the LRU, then the table, without
+reaching the write path. A repeat whose body differs from the original is
+rejected, since the stored response would not describe it.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: bytes
+    created_at: float
+
+
+def request_hash(payload: Any) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyCache:
+    """LRU of stored responses, bounded by entry count and age."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 24 * 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def expired(self, stored: StoredResponse, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - stored.created_at > self.ttl
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        stored = self._entries.get(key)
+        if stored is None:
+            return None
+        if self.expired(stored):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return stored
+
+    def put(self, key: str, stored: StoredResponse):
+        self._entries[key] = stored
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
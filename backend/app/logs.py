@@ -0,0 +1,47 @@
+"""Logging setup.
+
+`LOG_LEVEL` controls verbosity (use WARNING in production to silence the
+per-request info/debug lines) and `LOG_FORMAT=json` emits one JSON object
+per line. Hot paths log through `log_sampled` so only a fraction of their
+messages are even formatted.
+"""
+import json
+import logging
+import random
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text"):
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger("app")
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+
+
+def log_sampled(logger: logging.Logger, level: int, rate: float, msg: str, **fields):
+    """Log `msg` with structured `fields` for roughly `rate` of calls."""
+    if rate <= 0 or not logger.isEnabledFor(level):
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.log(level, msg, extra=fields)
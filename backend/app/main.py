@@ -1,74 +1,102 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .routers import menu, orders
-from .sse import sse_router
-from .database import engine, Base
-from . import crud, schemas
+from .routers import analytics, menu, orders
+from .sse import sse_router, broker
+from .writer import writer
+from .database import engine, read_engine, Base
+from .config import settings
+from .logs import configure_logging
+from . import archive, catalog, crud, metrics, migrations
+from .admission import AdmissionMiddleware
+import logging
 import os
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Always create tables if they don't exist
-    print("Creating database tables...")
+configure_logging(settings.log_level, settings.log_format)
+logger = logging.getLogger(__name__)
+
+metrics.instrument_engine(engine, "writer")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "reader")
+
+async def prepare_database():
+    """Create missing tables and apply pending migrations."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
-    # Seed menu items if table is empty (and not in testing mode)
+    return await migrations.migrate(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Creating database tables")
+    applied = await prepare_database()
+    if applied:
+        logger.info("Applied schema migrations", extra={"versions": applied})
+
+    # Seed an empty menu from the fixture catalog (not in testing mode)
     if not os.getenv("TESTING"):
-        existing = await crud.get_all_menu_items_()
-        if len(existing) == 0:
-            print("Seeding database with initial menu items...")
-            await crud.create_menu_item(schemas.MenuItemCreate(
-                name="Margherita Pizza",
-                description="Classic cheese and tomato pizza",
-                price=12.99,
-                image_url="https://images.unsplash.com/photo-1574071318508-1cdbab80d002?w=400"
-            ))
-            await crud.create_menu_item(schemas.MenuItemCreate(
-                name="Cheeseburger",
-                description="Juicy beef patty with cheese",
-                price=8.99,
-                image_url="https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400"
-            ))
-            await crud.create_menu_item(schemas.MenuItemCreate(
-                name="Caesar Salad",
-                description="Fresh romaine with Caesar dressing",
-                price=6.99,
-                image_url="https://images.unsplash.com/photo-1550304943-4f24f54ddde9?w=400"
-            ))
-            await crud.create_menu_item(schemas.MenuItemCreate(
-                name="Sushi Platter",
-                description="Assorted fresh sushi",
-                price=15.99,
-                image_url="https://images.unsplash.com/photo-1579871494447-9811cf80d66c?w=400"
-            ))
-            await crud.create_menu_item(schemas.MenuItemCreate(
-                name="Pasta Carbonara",
-                description="Creamy Italian pasta",
-                price=11.99,
-                image_url="https://images.unsplash.com/photo-1612874742237-6526221588e3?w=400"
-            ))
-            print("Database seeded successfully!")
+        seeded = await catalog.seed_menu(settings.menu_seed_file)
+        if seeded:
+            logger.info("Database seeded", extra={"menu_items": seeded})
         else:
-            print(f"Database already has {len(existing)} menu items")
-    
+            logger.info("Menu already seeded")
+
+    # Start the broker first: events from other workers that land while the
+    # projection loads are then applied on top of it rather than lost.
+    await broker.start()
+    if settings.active_orders_projection:
+        if settings.sse_broker == "memory":
+            logger.warning("Active orders projection uses the in-process broker; it goes stale if several workers write")
+        await crud.active_orders.load(crud.load_active_orders)
+    if settings.group_commit_enabled:
+        await writer.start()
+    if settings.archive_after_days > 0:
+        await archive.scheduler.start()
     yield
+    await archive.scheduler.stop()
+    await writer.stop()
+    await broker.stop()
+    crud.active_orders.reset()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 app = FastAPI(title="Order Management API", lifespan=lifespan)
 
+# Added first so it sits inside the metrics and CORS middleware: rejected
+# requests are still measured and still carry CORS headers.
+if settings.admission_enabled:
+    app.add_middleware(
+        AdmissionMiddleware,
+        rate=settings.write_rate_per_client,
+        burst=settings.write_burst_per_client,
+        max_concurrent=settings.max_concurrent_writes,
+        max_queued=settings.max_queued_writes,
+        queue_timeout=settings.write_queue_timeout,
+        trusted_proxies=settings.trusted_proxies.split(","),
+    )
+
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Idempotent-Replayed", "Retry-After"],
 )
 
 app.include_router(menu.router, prefix="/api/menu", tags=["menu"])
 app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
 app.include_router(sse_router, prefix="/api/sse", tags=["sse"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 @app.get("/")
 def read_root():
-    return {"message": "Order Management API"}
\ No newline at end of file
+    return {"message": "Order Management API"}
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
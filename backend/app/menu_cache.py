@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    items: List[dict]
+    by_id: Dict[int, dict]
+    body: bytes
+    etag: str
+    loaded_at: float
+
+
+class MenuCache:
+    """Versioned snapshot of the menu table.
+
+    Writers call `invalidate()` after committing; the next read rebuilds the
+    snapshot once and every request until the following write is served from
+    it. The ETag is derived from the body, so it is stable across workers.
+    Invalidation is per process, so `ttl` bounds how long another worker can
+    serve a menu that was changed elsewhere.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[List[dict]]], ttl: float = 30.0):
+        self._loader = loader
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: MenuSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+
+    def _is_fresh(self, snapshot: MenuSnapshot | None) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self.version
+            and time.monotonic() - snapshot.loaded_at < self.ttl
+        )
+
+    async def get(self) -> MenuSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        async with self._lock:
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            version = self.version
+            items = await self._loader()
+            body = json.dumps(items, separators=(",", ":")).encode()
+            self._snapshot = MenuSnapshot(
+                version=version,
+                items=items,
+                by_id={item["id"]: item for item in items},
+                body=body,
+                etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+                loaded_at=time.monotonic(),
+            )
+            return self._snapshot
@@ -0,0 +1,239 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Deliberately small: counters, gauges (optionally computed on scrape) and
+histograms with fixed buckets, keyed by label tuples. Values are per
+process; with several workers each one reports its own.
+"""
+import bisect
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelKey, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(_Metric):
+    """A gauge set explicitly, or computed by `fn` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Callable[[], float] | None = None):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self._fn is not None:
+            yield f"{self.name} {self._fn()}"
+            return
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total[0]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until response headers are sent.",
+    ("method", "route", "status"),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time.",
+    ("engine", "operation", "table"),
+))
+sse_notify_duration = registry.register(Histogram(
+    "sse_notify_duration_seconds",
+    "Time to publish one status event and fan it out to local subscribers.",
+))
+sse_fanout_size = registry.register(Histogram(
+    "sse_fanout_subscribers",
+    "Local subscribers reached by one status event.",
+    buckets=SIZE_BUCKETS,
+))
+sse_dropped_events = registry.register(Counter(
+    "sse_dropped_events_total",
+    "Events evicted from a full subscriber queue.",
+))
+group_commit_batch_size = registry.register(Histogram(
+    "group_commit_batch_operations",
+    "Write operations committed together by the group-commit writer.",
+    buckets=SIZE_BUCKETS,
+))
+group_commit_wait = registry.register(Histogram(
+    "group_commit_wait_seconds",
+    "Time from submitting a write until its batch is committed.",
+))
+group_commit_flushes = registry.register(Counter(
+    "group_commit_flushes_total",
+    "Group commits, by what triggered the flush.",
+    ("trigger",),
+))
+
+
+# --- HTTP -----------------------------------------------------------------
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency. Routes are labelled by
+    their path template, so ids in URLs don't create new series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        recorded = False
+
+        async def send_wrapper(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                route = scope.get("route")
+                http_request_duration.observe(
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=message["status"],
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# --- Database -------------------------------------------------------------
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+
+def _classify(statement: str) -> Tuple[str, str]:
+    stripped = statement.lstrip()
+    operation = stripped.split(None, 1)[0].upper() if stripped else "UNKNOWN"
+    match = _TABLE_RE.search(stripped)
+    return operation, match.group(1) if match else ""
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement on an AsyncEngine via cursor execute events."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        operation, table = _classify(statement)
+        db_query_duration.observe(time.perf_counter() - started, engine=name, operation=operation, table=table)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute is skipped for failed statements.
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,245 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so changes to
+existing tables (indexes, columns, virtual tables) are applied here. Each
+migration runs once per database, inside the startup transaction, and must
+be safe on a database that create_all has just built from the current
+models.
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+from sqlalchemy import Connection, text
+from .models import Order, OrderArchive, OrderChange, OrderItem, OrderItemArchive, SalesHourly, SalesItemHourly
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return register
+
+
+@migration(1, "index order lookups")
+def _index_order_lookups(conn: Connection):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_order_items_menu_item_id ON order_items (menu_item_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_status ON orders (status)"))
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str):
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+@migration(2, "order price snapshots and summaries")
+def _order_summaries(conn: Connection):
+    _add_column_if_missing(conn, "order_items", "unit_price", "FLOAT")
+    _add_column_if_missing(conn, "orders", "total", "FLOAT NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "orders", "item_count", "INTEGER NOT NULL DEFAULT 0")
+    # Existing lines never recorded a price; the current menu price is the
+    # best snapshot available.
+    conn.execute(text("""
+        UPDATE order_items SET unit_price = (
+            SELECT price FROM menu_items WHERE menu_items.id = order_items.menu_item_id
+        ) WHERE unit_price IS NULL
+    """))
+    conn.execute(text("""
+        UPDATE orders SET
+            total = COALESCE((SELECT ROUND(SUM(unit_price * quantity), 2) FROM order_items WHERE order_id = orders.id), 0),
+            item_count = COALESCE((SELECT SUM(quantity) FROM order_items WHERE order_id = orders.id), 0)
+    """))
+
+
+@migration(3, "menu full-text search")
+def _menu_search(conn: Connection):
+    if conn.dialect.name != "sqlite":
+        return
+    # External-content FTS5 index over menu_items, kept in sync by triggers.
+    # Prefix indexes make `piz*` style queries index lookups.
+    conn.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5(
+            name, description,
+            content='menu_items', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS menu_items_fts_insert AFTER INSERT ON menu_items BEGIN
+            INSERT INTO menu_items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS menu_items_fts_delete AFTER DELETE ON menu_items BEGIN
+            INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS menu_items_fts_update AFTER UPDATE ON menu_items BEGIN
+            INSERT INTO menu_items_fts (menu_items_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO menu_items_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+    """))
+    conn.execute(text("INSERT INTO menu_items_fts (menu_items_fts) VALUES ('rebuild')"))
+
+
+@migration(4, "order change log")
+def _order_change_log(conn: Connection):
+    OrderChange.__table__.create(conn, checkfirst=True)
+    # Orders created before the log existed enter the feed once, in id order.
+    conn.execute(
+        text("""
+            INSERT INTO order_changes (order_id, status, changed_at)
+            SELECT id, status, :now FROM orders
+            WHERE NOT EXISTS (SELECT 1 FROM order_changes)
+            ORDER BY id
+        """),
+        {"now": time.time()}
+    )
+
+
+@migration(5, "order timestamps and archive tables")
+def _order_archive(conn: Connection):
+    _add_column_if_missing(conn, "orders", "created_at", "FLOAT")
+    _add_column_if_missing(conn, "orders", "updated_at", "FLOAT")
+    # Older orders have no history to date them by; start their archival
+    # clock now.
+    conn.execute(text("UPDATE orders SET updated_at = :now WHERE updated_at IS NULL"), {"now": time.time()})
+    OrderArchive.__table__.create(conn, checkfirst=True)
+    OrderItemArchive.__table__.create(conn, checkfirst=True)
+
+
+@migration(6, "sales rollups")
+def _sales_rollups(conn: Connection):
+    SalesItemHourly.__table__.create(conn, checkfirst=True)
+    SalesHourly.__table__.create(conn, checkfirst=True)
+    if conn.execute(text("SELECT 1 FROM sales_hourly LIMIT 1")).first() is not None:
+        return
+    hour = "CAST(COALESCE(o.created_at, o.updated_at, 0) / 3600 AS INTEGER) * 3600"
+    line = "oi.quantity * COALESCE(oi.unit_price, 0)"
+    delivered = "o.status = 'delivered'"
+    columns = "order_count, quantity, revenue, delivered_orders, delivered_revenue"
+    for orders, items in (("orders", "order_items"), ("orders_archive", "order_items_archive")):
+        conn.execute(text(f"""
+            INSERT INTO sales_item_hourly (menu_item_id, hour, {columns})
+            SELECT oi.menu_item_id, {hour} AS hour,
+                   COUNT(DISTINCT o.id), SUM(oi.quantity), SUM({line}),
+                   COUNT(DISTINCT CASE WHEN {delivered} THEN o.id END),
+                   COALESCE(SUM(CASE WHEN {delivered} THEN {line} END), 0)
+            FROM {orders} o JOIN {items} oi ON oi.order_id = o.id
+            WHERE 1 = 1
+            GROUP BY oi.menu_item_id, hour
+            ON CONFLICT (menu_item_id, hour) DO UPDATE SET
+                order_count = sales_item_hourly.order_count + excluded.order_count,
+                quantity = sales_item_hourly.quantity + excluded.quantity,
+                revenue = sales_item_hourly.revenue + excluded.revenue,
+                delivered_orders = sales_item_hourly.delivered_orders + excluded.delivered_orders,
+                delivered_revenue = sales_item_hourly.delivered_revenue + excluded.delivered_revenue
+        """))
+        conn.execute(text(f"""
+            INSERT INTO sales_hourly (hour, {columns})
+            SELECT {hour} AS hour, COUNT(*), SUM(o.item_count), SUM(o.total),
+                   COUNT(CASE WHEN {delivered} THEN 1 END),
+                   COALESCE(SUM(CASE WHEN {delivered} THEN o.total END), 0)
+            FROM {orders} o
+            WHERE 1 = 1
+            GROUP BY hour
+            ON CONFLICT (hour) DO UPDATE SET
+                order_count = sales_hourly.order_count + excluded.order_count,
+                quantity = sales_hourly.quantity + excluded.quantity,
+                revenue = sales_hourly.revenue + excluded.revenue,
+                delivered_orders = sales_hourly.delivered_orders + excluded.delivered_orders,
+                delivered_revenue = sales_hourly.delivered_revenue + excluded.delivered_revenue
+        """))
+
+
+def _rebuild_with_autoincrement(conn: Connection, model):
+    """Recreate `model`'s table from the current model (AUTOINCREMENT
+    included), keeping its rows and any extra indexes."""
+    table = model.__table__.name
+    indexes = conn.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"),
+        {"table": table}
+    ).all()
+    # Keep references from other tables pointing at the new table's name.
+    conn.execute(text("PRAGMA legacy_alter_table = ON"))
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    conn.execute(text("PRAGMA legacy_alter_table = OFF"))
+    for name, _ in indexes:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    model.__table__.create(conn)
+    columns = ", ".join(column.name for column in model.__table__.columns)
+    conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old"))
+    conn.execute(text(f"DROP TABLE {table}_old"))
+    for _, sql in indexes:
+        conn.execute(text(re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", sql)))
+
+
+@migration(7, "never reuse archived order ids")
+def _autoincrement_order_ids(conn: Connection):
+    # Without AUTOINCREMENT SQLite reuses the highest rowid once its row is
+    # deleted, so archiving the newest order would hand its id (and its
+    # items' ids) to the next checkout.
+    if conn.dialect.name != "sqlite":
+        return
+    for model, archive in ((Order, "orders_archive"), (OrderItem, "order_items_archive")):
+        table = model.__table__.name
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {"table": table}
+        ).scalar()
+        if "AUTOINCREMENT" not in sql.upper():
+            _rebuild_with_autoincrement(conn, model)
+        # Start past every id ever used, archived ones included.
+        highest = conn.execute(text(f"""
+            SELECT MAX(seq) FROM (
+                SELECT MAX(id) AS seq FROM {table}
+                UNION ALL SELECT MAX(id) FROM {archive}
+                UNION ALL SELECT seq FROM sqlite_sequence WHERE name = :table
+            )
+        """), {"table": table}).scalar()
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :table"), {"table": table})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:table, :seq)"), {"table": table, "seq": highest or 0})
+
+
+@migration(8, "menu search ranking")
+def _menu_search_rank(conn: Connection):
+    # Stored in the FTS table's config, so `ORDER BY rank` weighs a name
+    # hit ten times a description hit without every query spelling out
+    # bm25(). FTS5 can then rank all matches itself and keep only the top
+    # LIMIT rows.
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text("INSERT INTO menu_items_fts (menu_items_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')"))
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """Apply pending migrations in version order; returns the versions run."""
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    ran = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in applied:
+            continue
+        m.upgrade(conn)
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+            {"version": m.version, "name": m.name, "applied_at": time.time()}
+        )
+        ran.append(m.version)
+    return ran
+
+
+async def migrate(engine) -> List[int]:
+    async with engine.begin() as conn:
+        return await conn.run_sync(run_migrations)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, LargeBinary, Enum as SQLEnum
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from .database import Base
 import enum
@@ -9,6 +9,14 @@ class OrderStatus(str, enum.Enum):
     out_for_delivery = "out_for_delivery"
     delivered = "delivered"
 
+# Orders only move forward, one step at a time.
+ALLOWED_TRANSITIONS = {
+    OrderStatus.received: OrderStatus.preparing,
+    OrderStatus.preparing: OrderStatus.out_for_delivery,
+    OrderStatus.out_for_delivery: OrderStatus.delivered,
+}
+PREVIOUS_STATUS = {after: before for before, after in ALLOWED_TRANSITIONS.items()}
+
 class MenuItem(Base):
     __tablename__ = "menu_items"
 
@@ -20,22 +28,121 @@ class MenuItem(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    # Never hand out an id again once its order is archived (app/archive.py).
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     customer_name: Mapped[str] = mapped_column(String, nullable=False)
     address: Mapped[str] = mapped_column(String, nullable=False)
     phone: Mapped[str] = mapped_column(String, nullable=False)
-    status: Mapped[OrderStatus] = mapped_column(SQLEnum(OrderStatus), default=OrderStatus.received, nullable=False)
+    status: Mapped[OrderStatus] = mapped_column(SQLEnum(OrderStatus), default=OrderStatus.received, nullable=False, index=True)
+    total: Mapped[float] = mapped_column(Float, nullable=False, default=0, server_default="0")
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Unix timestamps; NULL for orders created before they were recorded.
+    created_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id"))
-    menu_item_id: Mapped[int] = mapped_column(Integer, ForeignKey("menu_items.id"))
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id"), index=True)
+    menu_item_id: Mapped[int] = mapped_column(Integer, ForeignKey("menu_items.id"), index=True)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    unit_price: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     order: Mapped["Order"] = relationship("Order", back_populates="items")
-    menu_item: Mapped["MenuItem"] = relationship("MenuItem")
\ No newline at end of file
+    menu_item: Mapped["MenuItem"] = relationship("MenuItem")
+
+class OrderArchive(Base):
+    """Delivered orders moved out of the hot tables by app/archive.py."""
+    __tablename__ = "orders_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    customer_name: Mapped[str] = mapped_column(String, nullable=False)
+    address: Mapped[str] = mapped_column(String, nullable=False)
+    phone: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    total: Mapped[float] = mapped_column(Float, nullable=False)
+    item_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+class OrderItemArchive(Base):
+    __tablename__ = "order_items_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    menu_item_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    unit_price: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+class OrderEvent(Base):
+    __tablename__ = "order_events"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class OrderChange(Base):
+    """Change log for polling clients: one row per order creation or status
+    transition, written in the same transaction. The AUTOINCREMENT id is the
+    feed cursor, so it never goes backwards."""
+    __tablename__ = "order_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    changed_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+class IdempotencyKey(Base):
+    """Stored response for an Idempotency-Key, written in the same
+    transaction as the order it created."""
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String, nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[float] = mapped_column(Float, nullable=False, index=True)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+class SalesItemHourly(Base):
+    """Sales per menu item and hour of checkout (unix seconds at the start
+    of the hour), kept current in the same transaction as each order and
+    delivery. order_count and delivered_orders count orders containing the
+    item."""
+    __tablename__ = "sales_item_hourly"
+
+    menu_item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hour: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    delivered_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    delivered_revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+
+class SalesHourly(Base):
+    """Sales per hour of checkout across all items, so hourly order counts
+    don't double count orders with several items."""
+    __tablename__ = "sales_hourly"
+
+    hour: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    delivered_orders: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    delivered_revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0)
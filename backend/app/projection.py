@@ -0,0 +1,123 @@
+"""In-process read model of active (not yet delivered) orders.
+
+Order tracking is dominated by reads of orders still in flight, so each
+worker keeps those orders in memory. The projection is loaded at startup,
+then updated right after this worker commits a create or a status change,
+and from broker events for writes made by other workers. Delivered orders
+are evicted; anything not held here is read from the database.
+
+Until `load()` has run the projection is inactive: lookups miss and updates
+are ignored, so a partially filled projection is never served.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+from .models import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+_RANK = {status.value: rank for rank, status in enumerate(OrderStatus)}
+_SUMMARY_KEYS = ("id", "customer_name", "status", "total", "item_count")
+FINAL_STATUS = OrderStatus.delivered.value
+
+
+def _summary(order: dict) -> dict:
+    return {key: order[key] for key in _SUMMARY_KEYS}
+
+
+class ActiveOrders:
+    def __init__(self):
+        self._orders: Dict[int, dict] = {}
+        self._summaries: Dict[int, dict] = {}
+        # Orders being fetched after another worker created them, with the
+        # newest status seen for them while the fetch was in flight.
+        self._pending: Dict[int, Optional[str]] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    async def load(self, loader: Callable[[], Awaitable[List[dict]]]):
+        orders = await loader()
+        self._orders.clear()
+        self._summaries.clear()
+        self._pending.clear()
+        self.loaded = True
+        for order in orders:
+            self.add(order)
+        logger.info("Active orders loaded", extra={"orders": len(self._orders)})
+
+    def reset(self):
+        self._orders.clear()
+        self._summaries.clear()
+        self._pending.clear()
+        self.loaded = False
+
+    def get(self, order_id: int) -> Optional[dict]:
+        return self._orders.get(order_id)
+
+    def summaries(self, statuses=None) -> List[dict]:
+        wanted = None if not statuses else {getattr(s, "value", s) for s in statuses}
+        return [
+            summary for _, summary in sorted(self._summaries.items())
+            if wanted is None or summary["status"] in wanted
+        ]
+
+    def add(self, order: dict):
+        if not self.loaded or order["status"] == FINAL_STATUS:
+            return
+        order = {**order, "status": getattr(order["status"], "value", order["status"])}
+        self._orders[order["id"]] = order
+        self._summaries[order["id"]] = _summary(order)
+
+    def set_status(self, order_id: int, status: str):
+        """Apply a status change; stale or repeated changes are ignored, since
+        orders only move forward."""
+        if not self.loaded:
+            return
+        status = getattr(status, "value", status)
+        if order_id in self._pending:
+            seen = self._pending[order_id]
+            if seen is None or _RANK[status] > _RANK[seen]:
+                self._pending[order_id] = status
+            return
+        order = self._orders.get(order_id)
+        if order is None or _RANK[status] <= _RANK[order["status"]]:
+            return
+        if status == FINAL_STATUS:
+            del self._orders[order_id]
+            del self._summaries[order_id]
+            return
+        order = {**order, "status": status}
+        self._orders[order_id] = order
+        self._summaries[order_id] = _summary(order)
+
+    def apply_event(self, order_id: int, status: str, fetch: Callable[[int], Awaitable[Optional[dict]]]):
+        """Follow a broker event. Orders this worker hasn't seen are fetched
+        in the background; status changes that arrive meanwhile are replayed
+        onto the fetched row."""
+        if not self.loaded:
+            return
+        if order_id in self._orders or order_id in self._pending:
+            self.set_status(order_id, status)
+            return
+        if status == FINAL_STATUS:
+            return
+        self._pending[order_id] = None
+        asyncio.get_running_loop().create_task(self._fill(order_id, fetch))
+
+    async def _fill(self, order_id: int, fetch):
+        try:
+            order = await fetch(order_id)
+        except Exception:
+            logger.exception("Failed to fetch order for the active projection", extra={"order_id": order_id})
+            self._pending.pop(order_id, None)
+            return
+        if order_id not in self._pending:
+            return
+        latest = self._pending.pop(order_id)
+        if order is None:
+            return
+        self.add(order)
+        if latest is not None:
+            self.set_status(order_id, latest)
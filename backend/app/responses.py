@@ -0,0 +1,37 @@
+"""Fast response encoding.
+
+Routers normally return crud dicts and let FastAPI validate them against
+`response_model` and encode them with the stdlib. Those dicts are already
+built in the response shape, so with `FAST_JSON=1` they are encoded
+directly (with orjson when installed) and the revalidation is skipped.
+"""
+import json
+from typing import Any
+from fastapi import Response
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respond(payload: Any, status_code: int = 200, headers: dict | None = None):
+    """Return `payload` from a route. Headers must also be set on the route's
+    injected Response, which FastAPI uses when the payload is returned as-is."""
+    if settings.fast_json:
+        return FastJSONResponse(payload, status_code=status_code, headers=headers)
+    return payload
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException
+from typing import List, Literal, Optional
+from .. import crud, responses, schemas
+
+router = APIRouter()
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@router.get("/sales", response_model=List[schemas.SalesRollup])
+async def read_sales(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    menu_item_id: Optional[int] = None,
+    group_by: Literal["item_hour", "item", "hour"] = "item_hour",
+):
+    """Sales for checkouts in [start, end), from the hourly rollups. Times
+    without an offset are UTC; `start` is rounded down to the hour."""
+    start_ts, end_ts = _timestamp(start), _timestamp(end)
+    if start_ts is not None and end_ts is not None and end_ts <= start_ts:
+        raise HTTPException(status_code=422, detail="end must be after start")
+    return responses.respond(await crud.get_sales(start_ts, end_ts, menu_item_id, group_by))
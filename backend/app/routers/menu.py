@@ -1,13 +1,52 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from .. import crud, schemas
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from .. import catalog, crud, responses, schemas
 
 router = APIRouter()
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
 @router.get("/", response_model=List[schemas.MenuItemResponse])
-async def read_menu():
-    return await crud.get_all_menu_items_()
+async def read_menu(if_none_match: Optional[str] = Header(None)):
+    snapshot = await crud.get_menu_snapshot()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if if_none_match and _etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.get("/search", response_model=List[schemas.MenuItemResponse])
+async def search_menu(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100)):
+    """Full-text search over item names and descriptions, best match first.
+    Every word must match; the last one also matches as a prefix. All
+    matches are ranked, a hit in the name weighing ten times one in the
+    description."""
+    return responses.respond(await crud.search_menu_items(q, limit))
 
 @router.post("/", response_model=schemas.MenuItemResponse, status_code=201)
 async def create_menu_item(item: schemas.MenuItemCreate):
-    return await crud.create_menu_item(item)
\ No newline at end of file
+    return responses.respond(await crud.create_menu_item(item), status_code=201)
+
+
+_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@router.post("/import", response_model=schemas.MenuImportResult)
+async def import_menu(request: Request, format: Literal["csv", "ndjson"] = "csv"):
+    """Upsert menu items from a CSV (with a header row) or NDJSON request body.
+
+    The body is parsed as it arrives and written in batches, so large
+    catalogs don't have to fit in memory. Rows with an `id` update that item;
+    rows without one are created. Invalid rows are skipped and reported."""
+    try:
+        report = await catalog.import_menu(catalog.parse(request.stream(), format))
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return responses.respond(report)
+
+@router.get("/export")
+async def export_menu(format: Literal["csv", "ndjson"] = "csv"):
+    return StreamingResponse(catalog.export_menu(format), media_type=_MEDIA_TYPES[format])
@@ -1,29 +1,124 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from .. import crud, schemas
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from .. import crud, idempotency, responses, schemas
+from ..models import OrderStatus
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.OrderResponse])
-async def read_orders():
-    return await crud.get_all_orders_()
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 1000
+
+@router.get("/", response_model=List[schemas.OrderSummary])
+async def read_orders(
+    response: Response,
+    status: Optional[List[OrderStatus]] = Query(None),
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    format: Literal["json", "ndjson"] = "json",
+    order: Literal["asc", "desc"] = "asc",
+):
+    """List order summaries by ascending id, or newest first with
+    `order=desc`. Pass the `X-Next-Cursor` header value back as `after` (with
+    the same `order`) to get the next page; `format=ndjson` streams every
+    matching order (up to `limit`) instead of returning one page."""
+    descending = order == "desc"
+    if format == "ndjson":
+        async def lines():
+            async for summary in crud.stream_orders(after, status, limit, descending):
+                yield responses.dumps(summary) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    orders, next_cursor = await crud.get_orders_page(
+        after, status, min(limit or crud.ORDER_PAGE_SIZE, MAX_PAGE_SIZE), descending
+    )
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+    response.headers.update(headers)
+    return responses.respond(orders, headers=headers)
 
 @router.post("/", response_model=schemas.OrderResponse, status_code=201)
-async def create_order(order: schemas.OrderCreate):
-    return await crud.create_order(order)
+async def create_order(
+    order: schemas.OrderCreate,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+):
+    """Create an order. Retries that send the same `Idempotency-Key` (within
+    IDEMPOTENCY_TTL) get the original response back, marked with an
+    `Idempotent-Replayed` header, instead of creating another order."""
+    if idempotency_key is None:
+        try:
+            db_order = await crud.create_order(order)
+        except crud.UnknownMenuItemError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        await crud.notify_orders_created([db_order["id"]])
+        return responses.respond(db_order, status_code=201)
+
+    request_hash = idempotency.request_hash(order.model_dump(mode="json"))
+    stored = await crud.get_idempotent_response(idempotency_key)
+    db_order = None
+    if stored is None:
+        try:
+            stored, db_order = await crud.create_order_idempotent(order, idempotency_key, request_hash)
+        except crud.UnknownMenuItemError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    if db_order is not None:
+        await crud.notify_orders_created([db_order["id"]])
+        return responses.respond(db_order, status_code=201)
+    if stored.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+@router.post("/batch", response_model=List[schemas.OrderBatchResult])
+async def create_orders_batch(
+    orders: List[schemas.OrderCreate] = Body(..., min_length=1, max_length=MAX_BATCH_SIZE),
+):
+    """Bulk ingestion for partner integrations. Returns one result per
+    submitted order, in order, carrying either the created order or an error."""
+    results = await crud.create_orders_batch(orders)
+    await crud.notify_orders_created([r["order"]["id"] for r in results if r["order"] is not None])
+    return responses.respond(results)
+
+@router.get("/active", response_model=List[schemas.OrderSummary])
+async def read_active_orders(status: Optional[List[OrderStatus]] = Query(None)):
+    """Summaries of every order not yet delivered, by ascending id, served
+    from this worker's in-memory projection."""
+    return responses.respond(await crud.get_active_orders(status))
+
+@router.get("/changes", response_model=List[schemas.OrderChange])
+async def read_order_changes(
+    response: Response,
+    since: int = Query(0, ge=0),
+    limit: int = Query(crud.ORDER_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Orders created or updated after cursor `since`, each with its current
+    summary and the `seq` of its latest change. Poll again with the
+    `X-Next-Cursor` header value; it is always set, and equals `since` when
+    nothing changed."""
+    changes, next_cursor = await crud.get_order_changes(since, limit)
+    headers = {"X-Next-Cursor": str(next_cursor)}
+    response.headers.update(headers)
+    return responses.respond(changes, headers=headers)
 
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
 async def read_order(order_id: int):
     db_order = await crud.get_order_(order_id)
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    return db_order
+    return responses.respond(db_order)
 
-@router.patch("/{order_id}", response_model=schemas.OrderResponse)
+@router.patch("/{order_id}", response_model=schemas.OrderSummary)
 async def update_order(order_id: int, order_update: schemas.OrderUpdate):
-    db_order = await crud.update_order_(order_id, order_update)
+    """Advance the order one step (received -> preparing -> out_for_delivery
+    -> delivered). Returns 409 if the order isn't in the preceding status, or
+    in `expected_status` when given."""
+    try:
+        db_order = await crud.update_order_(order_id, order_update)
+    except crud.StatusConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    if order_update.status:
-        await crud.notify_order_status_change(order_id, order_update.status)
-    return db_order
\ No newline at end of file
+    await crud.notify_order_status_change(order_id, db_order["status"])
+    return responses.respond(db_order)
\ No newline at end of file
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from .models import OrderStatus
@@ -17,6 +18,15 @@ class MenuItemResponse(MenuItemBase):
     class Config:
         from_attributes = True
 
+class MenuImportError(BaseModel):
+    record: int
+    error: str
+
+class MenuImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[MenuImportError]
+
 class OrderItemBase(BaseModel):
     menu_item_id: int
     quantity: int = Field(..., gt=0)
@@ -26,6 +36,7 @@ class OrderItemCreate(OrderItemBase):
 
 class OrderItemResponse(OrderItemBase):
     id: int
+    unit_price: Optional[float] = None
     menu_item: MenuItemResponse
 
     class Config:
@@ -37,15 +48,45 @@ class OrderBase(BaseModel):
     phone: str
 
 class OrderCreate(OrderBase):
-    items: List[OrderItemCreate]
+    items: List[OrderItemCreate] = Field(..., min_length=1)
 
 class OrderResponse(OrderBase):
     id: int
     status: OrderStatus
+    total: float
+    item_count: int
     items: List[OrderItemResponse]
 
     class Config:
         from_attributes = True
 
+class OrderSummary(BaseModel):
+    id: int
+    customer_name: str
+    status: OrderStatus
+    total: float
+    item_count: int
+
+class OrderChange(OrderSummary):
+    seq: int
+
 class OrderUpdate(BaseModel):
-    status: Optional[OrderStatus] = None
\ No newline at end of file
+    status: OrderStatus
+    expected_status: Optional[OrderStatus] = None
+
+class OrderBatchResult(BaseModel):
+    index: int
+    order: Optional[OrderResponse] = None
+    error: Optional[str] = None
+
+class SalesRollup(BaseModel):
+    """One row of GET /api/analytics/sales. `hour` is None when grouped by
+    item; the menu item fields are None when grouped by hour."""
+    hour: Optional[datetime] = None
+    menu_item_id: Optional[int] = None
+    menu_item_name: Optional[str] = None
+    order_count: int
+    quantity: int
+    revenue: float
+    delivered_orders: int
+    delivered_revenue: float
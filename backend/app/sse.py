@@ -1,43 +1,290 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import json
-from typing import List
-from .database import get_db
-from . import crud
+from . import crud, metrics
+from .broker import Event, create_broker
+from .config import settings
+from .logs import log_sampled
+from .models import OrderStatus
+
+logger = logging.getLogger(__name__)
 
 sse_router = APIRouter()
 
-subscribers: List[asyncio.Queue] = []
+# Per-subscriber queue bound. Status events for one order are few, so a full
+# queue means the client has stopped reading; we drop its oldest message
+# rather than let memory grow.
+SUBSCRIBER_QUEUE_SIZE = 16
+
+# A multiplexed stream sees every event for the orders it watches, so it
+# gets a deeper queue. If it still overflows, the stream resyncs with a
+# fresh snapshot instead of leaving the client with gaps.
+MULTIPLEX_QUEUE_SIZE = 1024
+MAX_STREAM_ORDER_IDS = 1000
+ACTIVE_STATUSES = tuple(s for s in OrderStatus if s is not OrderStatus.delivered)
+
+
+class Subscription:
+    """A client's event queue. `order_ids` is None for a subscription that
+    receives events for every order."""
+
+    def __init__(self, order_ids: Optional[Tuple[int, ...]], maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.order_ids = order_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        # Highest event id pushed so far.
+        self.last_id = 0
+
+    def push(self, event: Event):
+        """Enqueue without blocking, evicting the oldest event when full."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            metrics.sse_dropped_events.inc()
+        self.last_id = max(self.last_id, event.id)
+        self.queue.put_nowait(event)
+
+
+class SubscriptionRegistry:
+    """Subscriptions indexed by order id, so a notify only touches the
+    queues of clients watching that order plus the all-orders subscribers."""
+
+    def __init__(self):
+        self._topics: Dict[int, Set[Subscription]] = {}
+        self._wildcard: Set[Subscription] = set()
+        self._subscriptions: Set[Subscription] = set()
+
+    def subscribe(self, order_id: int) -> Subscription:
+        return self.subscribe_many([order_id])
+
+    def subscribe_many(self, order_ids: Iterable[int], maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> Subscription:
+        sub = Subscription(tuple(dict.fromkeys(order_ids)), maxsize)
+        for order_id in sub.order_ids:
+            self._topics.setdefault(order_id, set()).add(sub)
+        self._subscriptions.add(sub)
+        return sub
+
+    def subscribe_all(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> Subscription:
+        sub = Subscription(None, maxsize)
+        self._wildcard.add(sub)
+        self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscriptions.discard(sub)
+        if sub.order_ids is None:
+            self._wildcard.discard(sub)
+            return
+        for order_id in sub.order_ids:
+            topic = self._topics.get(order_id)
+            if topic is None:
+                continue
+            topic.discard(sub)
+            if not topic:
+                del self._topics[order_id]
+
+    def publish(self, event: Event) -> int:
+        topic = self._topics.get(event.order_id, ())
+        for sub in topic:
+            sub.push(event)
+        for sub in self._wildcard:
+            sub.push(event)
+        return len(topic) + len(self._wildcard)
+
+    def count(self, order_id: int | None = None) -> int:
+        if order_id is not None:
+            return len(self._topics.get(order_id, ())) + len(self._wildcard)
+        return len(self._subscriptions)
+
+    def queued(self) -> int:
+        return sum(sub.queue.qsize() for sub in self._subscriptions)
+
+
+registry = SubscriptionRegistry()
+
+metrics.registry.register(metrics.Gauge(
+    "sse_subscribers", "Open SSE subscriptions in this process.", fn=registry.count
+))
+metrics.registry.register(metrics.Gauge(
+    "sse_queued_events", "Events waiting in SSE subscriber queues.", fn=registry.queued
+))
+
+
+def _dispatch(event: Event) -> int:
+    # Also keeps this worker's active-orders projection current with writes
+    # made by other workers; local writes have already been applied.
+    crud.active_orders.apply_event(event.order_id, event.status, crud.get_order)
+    delivered = registry.publish(event)
+    metrics.sse_fanout_size.observe(delivered)
+    return delivered
+
+
+broker = create_broker(
+    settings.sse_broker,
+    _dispatch,
+    history_size=settings.sse_replay_size,
+    poll_interval=settings.sse_poll_interval,
+    retention=settings.sse_event_retention,
+)
+
 
 async def notify_subscribers(order_id: int, status: str):
-    message = json.dumps({"order_id": order_id, "status": status})
-    print(f"[SSE] Notifying {len(subscribers)} subscribers about order {order_id} status: {status}")
-    for queue in subscribers:
-        await queue.put(message)
+    start = time.perf_counter()
+    event = await broker.publish(order_id, status)
+    metrics.sse_notify_duration.observe(time.perf_counter() - start)
+    log_sampled(
+        logger, logging.DEBUG, settings.sse_log_sample_rate, "sse event published",
+        event_id=event.id, order_id=order_id, status=status,
+    )
+
+
+async def notify_subscribers_many(changes: List[Tuple[int, str]]):
+    start = time.perf_counter()
+    events = await broker.publish_many(changes)
+    metrics.sse_notify_duration.observe(time.perf_counter() - start)
+    log_sampled(
+        logger, logging.DEBUG, settings.sse_log_sample_rate, "sse events published",
+        count=len(events), last_event_id=events[-1].id if events else None,
+    )
+
+
+def _parse_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
 
 @sse_router.get("/orders/{order_id}")
-async def stream_order_status(request: Request, order_id: int):
-    print(f"[SSE] New subscriber for order {order_id}")
+async def stream_order_status(
+    request: Request,
+    order_id: int,
+    last_event_id: Optional[str] = Header(None),
+):
+    logger.debug("sse subscriber connected", extra={"order_id": order_id})
+    resume_from = _parse_event_id(last_event_id)
+
+    async def event_generator():
+        # Subscribe before replaying so nothing published in between is lost;
+        # live events already covered by the replay are skipped by id.
+        sub = registry.subscribe(order_id)
+        last_sent = 0
+        try:
+            if resume_from is not None:
+                for event in await broker.replay(order_id, resume_from):
+                    last_sent = event.id
+                    yield event.frame
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=30)
+                    if event.id <= last_sent:
+                        continue
+                    last_sent = event.id
+                    yield event.frame
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            registry.unsubscribe(sub)
+            logger.debug("sse subscriber disconnected", extra={"order_id": order_id, "dropped": sub.dropped})
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+class StatusFilter:
+    """Decides which events a status-filtered stream forwards.
+
+    Orders currently in one of `statuses` are tracked; an event is sent if
+    the order enters the filter or was tracked before, so clients also see
+    the transition that takes an order out of their view.
+    """
+
+    def __init__(self, statuses: Optional[Iterable[str]]):
+        self.statuses = None if statuses is None else {getattr(s, "value", s) for s in statuses}
+        self.tracked: Set[int] = set()
+
+    def reset(self, snapshot: List[dict]):
+        self.tracked = {order["id"] for order in snapshot}
+
+    def accept(self, event: Event) -> bool:
+        if self.statuses is None:
+            return True
+        if event.status in self.statuses:
+            self.tracked.add(event.order_id)
+            return True
+        if event.order_id in self.tracked:
+            self.tracked.discard(event.order_id)
+            return True
+        return False
+
+
+def _parse_order_ids(value: Optional[str]) -> Optional[List[int]]:
+    if value is None:
+        return None
+    try:
+        order_ids = list(dict.fromkeys(int(v) for v in value.split(",") if v.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not order_ids or len(order_ids) > MAX_STREAM_ORDER_IDS:
+        raise HTTPException(status_code=400, detail=f"ids must list between 1 and {MAX_STREAM_ORDER_IDS} orders")
+    return order_ids
+
+
+def _snapshot_frame(orders: List[dict]) -> str:
+    return f"event: snapshot\ndata: {json.dumps(orders)}\n\n"
+
+
+@sse_router.get("/orders")
+async def stream_orders_status(
+    request: Request,
+    ids: Optional[str] = Query(None, description="Comma-separated order ids to watch"),
+    status: Optional[List[OrderStatus]] = Query(None),
+):
+    """One stream for many orders. Starts with an `event: snapshot` frame
+    holding the matching order summaries, then sends the same status events
+    as the per-order stream. Without `ids` it watches every order, limited
+    to `status` (default: all statuses except delivered); new orders show up
+    as `received` events."""
+    order_ids = _parse_order_ids(ids)
+    statuses = status or (ACTIVE_STATUSES if order_ids is None else None)
+    logger.debug("sse multiplexed subscriber connected", extra={"order_count": len(order_ids or ())})
 
     async def event_generator():
-        queue = asyncio.Queue()
-        subscribers.append(queue)
+        # Subscribe before taking the snapshot so nothing published in
+        # between is lost. An event is published only after its write
+        # commits, so every event up to the last one pushed before the
+        # snapshot is read is already reflected in it; sending those (they
+        # are still queued after a resync) could roll a status back.
+        if order_ids is None:
+            sub = registry.subscribe_all(MULTIPLEX_QUEUE_SIZE)
+        else:
+            sub = registry.subscribe_many(order_ids, MULTIPLEX_QUEUE_SIZE)
+        status_filter = StatusFilter(statuses)
+        dropped = None
+        high_water = 0
         try:
             while True:
+                if dropped != sub.dropped:
+                    dropped = sub.dropped
+                    high_water = sub.last_id
+                    snapshot = await crud.get_order_summaries(order_ids, statuses)
+                    status_filter.reset(snapshot)
+                    yield _snapshot_frame(snapshot)
                 if await request.is_disconnected():
                     break
                 try:
-                    message = await asyncio.wait_for(queue.get(), timeout=30)
-                    data = json.loads(message)
-                    if data["order_id"] == order_id:
-                        print(f"[SSE] Sending message to client {order_id}: {message}")
-                        yield f"data: {message}\n\n"
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=30)
+                    if event.id > high_water and status_filter.accept(event):
+                        yield event.frame
                 except asyncio.TimeoutError:
                     yield ": keep-alive\n\n"
         finally:
-            if queue in subscribers:
-                subscribers.remove(queue)
-            print(f"[SSE] Subscriber disconnected for order {order_id}")
+            registry.unsubscribe(sub)
+            logger.debug("sse multiplexed subscriber disconnected", extra={"dropped": sub.dropped})
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
\ No newline at end of file
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
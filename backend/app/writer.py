@@ -0,0 +1,134 @@
+"""Group commit for the write path.
+
+On SQLite every commit is a WAL append plus (with synchronous=FULL) an
+fsync, so committing each checkout separately caps throughput. With group
+commit enabled, writes are queued to a single task that runs them in one
+transaction, each inside its own savepoint, and commits once. A caller's
+`submit()` resolves only after that commit, so a returned result is as
+durable as it would be without batching; an operation that raises is
+rolled back to its savepoint without affecting the rest of the batch.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import metrics
+from .config import settings
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+Operation = Callable[[AsyncSession], Awaitable[Any]]
+_Pending = Tuple[Operation, asyncio.Future, float]
+
+
+class GroupCommitWriter:
+    def __init__(self, session_factory=AsyncSessionLocal, interval: float = 0.002, max_batch: int = 64):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue: "asyncio.Queue[Optional[_Pending]]" = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit everything already queued, then stop."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._queue.put_nowait(None)
+        await task
+
+    async def submit(self, op: Operation):
+        """Run `op(session)` in the next batch and return its result once
+        the batch is committed."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch: List[_Pending] = [first]
+            deadline = loop.time() + self.interval
+            stopping = False
+            trigger = "interval"
+            while len(batch) < self.max_batch:
+                # Take whatever is already queued before waiting for more.
+                try:
+                    pending = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        pending = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if pending is None:
+                    stopping = True
+                    trigger = "shutdown"
+                    break
+                batch.append(pending)
+            else:
+                trigger = "size"
+            await self._commit(batch, trigger)
+            if stopping:
+                return
+
+    async def _commit(self, batch: List[_Pending], trigger: str):
+        outcomes = []
+        try:
+            async with self.session_factory() as session:
+                for op, future, _ in batch:
+                    if future.done():
+                        # The caller went away before its turn; skip the write.
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            outcomes.append((future, await op(session), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+                await session.commit()
+        except Exception as exc:
+            logger.exception("group commit failed", extra={"operations": len(batch)})
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        metrics.group_commit_batch_size.observe(len(outcomes))
+        metrics.group_commit_flushes.inc(trigger=trigger)
+        committed = time.perf_counter()
+        for _, _, submitted in batch:
+            metrics.group_commit_wait.observe(committed - submitted)
+        for future, result, exc in outcomes:
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+writer = GroupCommitWriter(
+    interval=settings.group_commit_interval_ms / 1000,
+    max_batch=settings.group_commit_max_batch,
+)
+
+metrics.registry.register(metrics.Gauge(
+    "group_commit_queued_operations", "Writes waiting for the next group commit.", fn=writer.queued
+))
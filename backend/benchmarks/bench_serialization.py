@@ -0,0 +1,89 @@
+"""Per-order serialization cost: FastAPI's response_model path vs. the
+FAST_JSON path in app/responses.py.
+
+    python -m benchmarks.bench_serialization --orders 1000 --items 3
+"""
+import argparse
+import json
+import time
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app import responses, schemas
+
+
+def make_orders(count: int, items_per_order: int) -> List[dict]:
+    return [
+        {
+            "id": order_id,
+            "customer_name": f"Customer {order_id}",
+            "address": f"{order_id} Main St",
+            "phone": "555-0100",
+            "status": "preparing",
+            "total": 12.99 * items_per_order,
+            "item_count": items_per_order,
+            "items": [
+                {
+                    "id": order_id * items_per_order + n,
+                    "menu_item_id": n + 1,
+                    "quantity": 1,
+                    "unit_price": 12.99,
+                    "menu_item": {
+                        "id": n + 1,
+                        "name": "Margherita Pizza",
+                        "description": "Classic cheese and tomato pizza",
+                        "price": 12.99,
+                        "image_url": "https://images.unsplash.com/photo-1574071318508-1cdbab80d002?w=400",
+                    },
+                }
+                for n in range(items_per_order)
+            ],
+        }
+        for order_id in range(1, count + 1)
+    ]
+
+
+def validated_path(adapter: TypeAdapter, orders: List[dict]) -> bytes:
+    # What FastAPI does for a returned dict: validate against response_model,
+    # turn the models back into primitives, then encode with the stdlib.
+    return json.dumps(jsonable_encoder(adapter.validate_python(orders))).encode()
+
+
+def fast_path(orders: List[dict]) -> bytes:
+    return responses.dumps(orders)
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders, args.items)
+    adapter = TypeAdapter(List[schemas.OrderResponse])
+    assert json.loads(validated_path(adapter, orders)) == json.loads(fast_path(orders))
+
+    before = timeit(lambda: validated_path(adapter, orders), args.repeat)
+    after = timeit(lambda: fast_path(orders), args.repeat)
+    print(json.dumps({
+        "orders": args.orders,
+        "items_per_order": args.items,
+        "encoder": "orjson" if responses.orjson is not None else "json",
+        "validated_us_per_order": round(before / args.orders * 1e6, 2),
+        "fast_us_per_order": round(after / args.orders * 1e6, 2),
+        "speedup": round(before / after, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
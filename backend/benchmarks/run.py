@@ -0,0 +1,260 @@
+"""Load and latency benchmarks for the API.
+
+Drives the ASGI app in-process with an async httpx client against a fresh
+SQLite file and prints one JSON document with p50/p95/p99 latencies and
+throughput per scenario, so runs can be diffed between commits:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --scenarios orders --order-counts 1000,10000
+
+Scenarios:
+    menu      GET /api/menu/ throughput
+    checkout  concurrent POST /api/orders/ bursts (set GROUP_COMMIT_ENABLED=1
+              to compare against the group-commit write path)
+    orders    GET /api/orders/ (one page and a full ndjson stream) at each
+              seeded order count
+    search    GET /api/menu/search over a catalog of --menu-size items
+    sse       PATCH /api/orders/{id} to SSE delivery latency with N
+              subscribers. httpx's ASGI transport buffers whole responses,
+              so subscribers attach to the SSE registry directly; the
+              measured path is request -> broker -> subscriber queue.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Settings are read at import time, so configure before importing the app.
+_db_dir = tempfile.mkdtemp(prefix="orders-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db_dir}/bench.db")
+os.environ.setdefault("TESTING", "1")
+# Load comes from one in-process client; measure the app, not the rate limiter.
+os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+import httpx  # noqa: E402
+from app import catalog, crud, migrations, schemas, sse  # noqa: E402
+from app.database import Base, engine, read_engine  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.writer import writer  # noqa: E402
+
+SEED_BATCH = 1000
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+    }
+
+
+async def run_concurrently(total, concurrency, request):
+    """Issue `total` calls of `request()` with at most `concurrency` in flight."""
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await request()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.request.url} -> {response.status_code}: {response.text[:200]}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def reset_database():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await migrations.migrate(engine)
+    crud.menu_cache.invalidate()
+
+
+async def seed_menu(count=20):
+    for n in range(count):
+        await crud.create_menu_item(schemas.MenuItemCreate(
+            name=f"Item {n}", description="Benchmark item", price=5 + n
+        ))
+
+
+def order_payload(n):
+    return {
+        "customer_name": f"Bench {n}",
+        "address": f"{n} Bench St",
+        "phone": "555-0100",
+        "items": [{"menu_item_id": 1 + n % 20, "quantity": 1 + n % 3}, {"menu_item_id": 1 + (n + 7) % 20, "quantity": 1}],
+    }
+
+
+async def seed_orders(count):
+    for start in range(0, count, SEED_BATCH):
+        batch = [schemas.OrderCreate(**order_payload(n)) for n in range(start, min(count, start + SEED_BATCH))]
+        await crud.create_orders_batch(batch)
+
+
+async def bench_menu(client, args):
+    return await run_concurrently(args.requests, args.concurrency, lambda: client.get("/api/menu/"))
+
+
+async def bench_checkout(client, args):
+    counter = iter(range(10 ** 9))
+    return await run_concurrently(
+        args.requests, args.concurrency,
+        lambda: client.post("/api/orders/", json=order_payload(next(counter))),
+    )
+
+
+async def bench_orders(client, args):
+    results = {}
+    for count in args.order_counts:
+        await reset_database()
+        await seed_menu()
+        await seed_orders(count)
+        page = await run_concurrently(
+            args.requests, args.concurrency, lambda: client.get("/api/orders/", params={"limit": 100})
+        )
+        stream_latencies = []
+        start = time.perf_counter()
+        for _ in range(args.stream_repeat):
+            t = time.perf_counter()
+            response = await client.get("/api/orders/", params={"format": "ndjson"})
+            stream_latencies.append(time.perf_counter() - t)
+            assert response.text.count("\n") == count
+        results[str(count)] = {
+            "page_100": page,
+            "ndjson_full": summarize(stream_latencies, time.perf_counter() - start),
+        }
+    return results
+
+
+SEARCH_WORDS = ["spicy", "garlic", "truffle", "crispy", "smoked", "vegan", "lemon", "chili", "herb", "cheese"]
+SEARCH_DISHES = ["pizza", "burger", "salad", "noodles", "curry", "taco", "risotto", "soup", "wrap", "sushi"]
+
+
+async def bench_search(client, args):
+    async def records():
+        for n in range(args.menu_size):
+            word = SEARCH_WORDS[n % len(SEARCH_WORDS)]
+            dish = SEARCH_DISHES[(n // len(SEARCH_WORDS)) % len(SEARCH_DISHES)]
+            yield {"name": f"{word.title()} {dish.title()} {n}", "description": f"{word} {dish} from kitchen {n % 500}", "price": 5 + n % 20}
+
+    await catalog.import_menu(records())
+    queries = iter(range(10 ** 9))
+    terms = ["pizz", "spicy cur", "garlic", "truffle ris", "kitchen 42"]
+    return await run_concurrently(
+        args.requests, args.concurrency,
+        lambda: client.get("/api/menu/search", params={"q": terms[next(queries) % len(terms)], "limit": 20}),
+    )
+
+
+async def bench_sse(client, args):
+    results = {}
+    for subscribers in args.subscribers:
+        latencies = []
+        start_all = time.perf_counter()
+        for n in range(args.sse_rounds):
+            # A fresh order per round, walked through the real status flow.
+            order_id = (await client.post("/api/orders/", json=order_payload(n))).json()["id"]
+            subs = [sse.registry.subscribe(order_id) for _ in range(subscribers)]
+            try:
+                for status in ("preparing", "out_for_delivery", "delivered"):
+                    start = time.perf_counter()
+                    response = await client.patch(f"/api/orders/{order_id}", json={"status": status})
+                    response.raise_for_status()
+                    for sub in subs:
+                        await sub.queue.get()
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                for sub in subs:
+                    sse.registry.unsubscribe(sub)
+        results[str(subscribers)] = summarize(latencies, time.perf_counter() - start_all)
+    return results
+
+
+SCENARIOS = {
+    "menu": bench_menu,
+    "checkout": bench_checkout,
+    "orders": bench_orders,
+    "search": bench_search,
+    "sse": bench_sse,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "group_commit": settings.group_commit_enabled,
+        },
+        "results": {},
+    }
+    # The ASGI transport doesn't run the app lifespan.
+    if settings.group_commit_enabled:
+        await writer.start()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                await reset_database()
+                await seed_menu()
+                print(f"running {name}...", file=sys.stderr)
+                report["results"][name] = await SCENARIOS[name](client, args)
+    finally:
+        await writer.stop()
+        await engine.dispose()
+        await read_engine.dispose()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--order-counts", type=int_list, default=[1000, 10000, 100000])
+    parser.add_argument("--menu-size", type=int, default=100000)
+    parser.add_argument("--stream-repeat", type=int, default=3)
+    parser.add_argument("--subscribers", type=int_list, default=[1, 100, 1000])
+    parser.add_argument("--sse-rounds", type=int, default=10)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - SCENARIOS.keys()
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args))
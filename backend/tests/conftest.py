@@ -0,0 +1,38 @@
+import pytest
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Settings are read at import time, so point the app at a throwaway file first.
+_test_db_dir = tempfile.mkdtemp(prefix="orders-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_test_db_dir}/orders.db")
+# Every test request comes from one client; admission control has its own tests.
+os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+from app.database import engine, read_engine, Base
+from app import migrations, models  # noqa: F401 (registers the tables on Base)
+
+@pytest.fixture(scope="session", autouse=True)
+def setup_database():
+    """Initialize and clean database for tests"""
+    os.environ["TESTING"] = "1"
+    # Drop and recreate all tables, then bring the schema up to date
+    async def init_db():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        await migrations.migrate(engine)
+    asyncio.run(init_db())
+    yield
+    # Clean up after all tests
+    async def cleanup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        # Pooled aiosqlite connections run on non-daemon threads; close them
+        # or the interpreter never exits.
+        await engine.dispose()
+        await read_engine.dispose()
+    asyncio.run(cleanup())
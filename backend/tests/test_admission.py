@@ -0,0 +1,109 @@
+import asyncio
+import httpx
+from app.admission import AdmissionMiddleware, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, burst=2, now=0)
+    assert bucket.take(0) == 0
+    assert bucket.take(0) == 0
+    assert bucket.take(0) == 0.5
+    assert bucket.take(0.5) == 0
+
+
+def _app(release: asyncio.Event):
+    async def app(scope, receive, send):
+        if scope["method"] == "POST":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+def _client(middleware, peer=("127.0.0.1", 123)):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware, client=peer), base_url="http://test")
+
+
+def test_rate_limit_is_per_client_and_skips_reads():
+    async def run():
+        release = asyncio.Event()
+        release.set()
+        middleware = AdmissionMiddleware(_app(release), rate=1, burst=2)
+        async with _client(middleware) as client:
+            codes = [(await client.post("/api/orders/")).status_code for _ in range(3)]
+            limited = await client.post("/api/orders/")
+            reads = [(await client.get("/api/menu/")).status_code for _ in range(5)]
+        return codes, limited, reads
+
+    codes, limited, reads = asyncio.run(run())
+    assert codes == [200, 200, 429]
+    assert limited.headers["retry-after"] == "1"
+    assert reads == [200] * 5
+
+
+def test_clients_behind_trusted_proxy_get_their_own_bucket():
+    async def run(trusted):
+        release = asyncio.Event()
+        release.set()
+        middleware = AdmissionMiddleware(_app(release), rate=1, burst=1, trusted_proxies=trusted)
+        async with _client(middleware) as client:
+            post = lambda forwarded: client.post("/api/orders/", headers={"X-Forwarded-For": forwarded})
+            return [(await post(hops)).status_code for hops in ("203.0.113.1", "203.0.113.2", "9.9.9.9, 203.0.113.1")]
+
+    # The test client connects from 127.0.0.1.
+    assert asyncio.run(run(["127.0.0.0/8"])) == [200, 200, 429]
+    assert asyncio.run(run(["10.0.0.0/8"])) == [200, 429, 429]
+
+
+def test_forwarded_headers_from_unconfigured_private_peer_are_ignored():
+    async def run():
+        release = asyncio.Event()
+        release.set()
+        middleware = AdmissionMiddleware(_app(release), rate=1, burst=1)
+        # A client reaching the published port through the Docker bridge.
+        async with _client(middleware, peer=("172.17.0.1", 40000)) as client:
+            return [
+                (await client.post("/api/orders/", headers={"X-Forwarded-For": f"198.51.100.{n}", "X-Real-IP": f"198.51.100.{n}"})).status_code
+                for n in range(3)
+            ]
+
+    assert asyncio.run(run()) == [200, 429, 429]
+
+
+def test_overload_sheds_writes_beyond_queue():
+    async def run():
+        release = asyncio.Event()
+        middleware = AdmissionMiddleware(
+            _app(release), rate=1000, burst=1000, max_concurrent=1, max_queued=1, queue_timeout=5
+        )
+        async with _client(middleware) as client:
+            running = asyncio.create_task(client.post("/api/orders/"))
+            queued = asyncio.create_task(client.post("/api/orders/"))
+            while middleware.queued < 1:
+                await asyncio.sleep(0.001)
+            shed = await client.post("/api/orders/")
+            read = await client.get("/api/menu/")
+            release.set()
+            return shed, read, (await running).status_code, (await queued).status_code
+
+    shed, read, running, queued = asyncio.run(run())
+    assert shed.status_code == 503
+    assert "retry-after" in shed.headers
+    assert read.status_code == 200
+    assert (running, queued) == (200, 200)
+
+
+def test_queued_write_times_out():
+    async def run():
+        release = asyncio.Event()
+        middleware = AdmissionMiddleware(_app(release), max_concurrent=1, queue_timeout=0.01)
+        async with _client(middleware) as client:
+            running = asyncio.create_task(client.post("/api/orders/"))
+            while middleware.in_flight < 1:
+                await asyncio.sleep(0.001)
+            timed_out = await client.post("/api/orders/")
+            release.set()
+            await running
+        return timed_out.status_code, middleware.in_flight
+
+    assert asyncio.run(run()) == (503, 0)
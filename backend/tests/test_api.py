@@ -1,8 +1,10 @@
-import pytest
 from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.config import settings
 from app.main import app
-from app.database import engine, Base
+from app.sse import registry
 import asyncio
+import json
 import sys
 import os
 
@@ -10,24 +12,6 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 client = TestClient(app)
 
-@pytest.fixture(scope="session", autouse=True)
-def setup_database():
-    """Initialize and clean database for tests"""
-    import os
-    os.environ["TESTING"] = "1"
-    # Drop and recreate all tables
-    async def init_db():
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
-            await conn.run_sync(Base.metadata.create_all)
-    asyncio.run(init_db())
-    yield
-    # Clean up after all tests
-    async def cleanup():
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
-    asyncio.run(cleanup())
-
 def test_read_root():
     response = client.get("/")
     assert response.status_code == 200
@@ -91,4 +75,285 @@ def test_update_order_status():
     order_id = create_resp.json()["id"]
     patch_resp = client.patch(f"/api/orders/{order_id}", json={"status": "preparing"})
     assert patch_resp.status_code == 200
-    assert patch_resp.json()["status"] == "preparing"
\ No newline at end of file
+    assert patch_resp.json()["status"] == "preparing"
+
+def test_create_order_with_unknown_item_writes_nothing():
+    before = len(client.get("/api/orders/").json())
+    order = {"customer_name": "Dan", "address": "1 Elm", "phone": "555-2222", "items": [{"menu_item_id": 1, "quantity": 1}, {"menu_item_id": 999, "quantity": 1}]}
+    response = client.post("/api/orders/", json=order)
+    assert response.status_code == 400
+    assert len(client.get("/api/orders/").json()) == before
+
+def test_create_order_returns_item_ids_in_request_order():
+    client.post("/api/menu/", json={"name": "Soup", "price": 4.5})
+    order = {"customer_name": "Eve", "address": "2 Elm", "phone": "555-3333", "items": [{"menu_item_id": 2, "quantity": 3}, {"menu_item_id": 1, "quantity": 1}]}
+    data = client.post("/api/orders/", json=order).json()
+    fetched = client.get(f"/api/orders/{data['id']}").json()
+    assert [(i["id"], i["menu_item_id"], i["quantity"]) for i in data["items"]] == \
+        [(i["id"], i["menu_item_id"], i["quantity"]) for i in fetched["items"]]
+
+def test_menu_etag_and_not_modified():
+    first = client.get("/api/menu/")
+    etag = first.headers["etag"]
+    cached = client.get("/api/menu/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    client.post("/api/menu/", json={"name": "Tea", "price": 2.0})
+    changed = client.get("/api/menu/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()[-1]["name"] == "Tea"
+
+def test_orders_keyset_pagination():
+    all_ids = [o["id"] for o in client.get("/api/orders/", params={"limit": 1000}).json()]
+    assert len(all_ids) >= 3
+    first = client.get("/api/orders/", params={"limit": 2})
+    assert [o["id"] for o in first.json()] == all_ids[:2]
+    cursor = first.headers["x-next-cursor"]
+    second = client.get("/api/orders/", params={"limit": 2, "after": cursor})
+    assert [o["id"] for o in second.json()] == all_ids[2:4]
+
+def test_orders_newest_first_pagination():
+    all_ids = [o["id"] for o in client.get("/api/orders/", params={"limit": 1000}).json()]
+    first = client.get("/api/orders/", params={"limit": 2, "order": "desc"})
+    assert [o["id"] for o in first.json()] == all_ids[::-1][:2]
+    cursor = first.headers["x-next-cursor"]
+    second = client.get("/api/orders/", params={"limit": 2, "order": "desc", "after": cursor})
+    assert [o["id"] for o in second.json()] == all_ids[::-1][2:4]
+    streamed = client.get("/api/orders/", params={"format": "ndjson", "order": "desc", "after": cursor})
+    assert [json.loads(line)["id"] for line in streamed.text.splitlines()] == all_ids[::-1][2:]
+
+def test_orders_status_filter():
+    orders = client.get("/api/orders/", params={"status": "preparing"}).json()
+    assert orders and all(o["status"] == "preparing" for o in orders)
+
+def test_orders_ndjson_stream():
+    response = client.get("/api/orders/", params={"format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    assert streamed == client.get("/api/orders/", params={"limit": 1000}).json()
+
+def test_create_orders_batch():
+    good = {"customer_name": "P1", "address": "1 Batch", "phone": "555", "items": [{"menu_item_id": 1, "quantity": 2}, {"menu_item_id": 2, "quantity": 1}]}
+    bad = {"customer_name": "P2", "address": "2 Batch", "phone": "555", "items": [{"menu_item_id": 999, "quantity": 1}]}
+    response = client.post("/api/orders/batch", json=[good, bad, good])
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["order"] is None and "999" in results[1]["error"]
+    first, third = results[0]["order"], results[2]["order"]
+    assert third["id"] > first["id"]
+    for created in (first, third):
+        fetched = client.get(f"/api/orders/{created['id']}").json()
+        assert [(i["id"], i["menu_item_id"], i["quantity"]) for i in fetched["items"]] == \
+            [(i["id"], i["menu_item_id"], i["quantity"]) for i in created["items"]]
+
+def test_create_orders_batch_rejects_empty_and_oversized():
+    assert client.post("/api/orders/batch", json=[]).status_code == 422
+    order = {"customer_name": "P", "address": "A", "phone": "5", "items": [{"menu_item_id": 1, "quantity": 1}]}
+    assert client.post("/api/orders/batch", json=[order] * 1001).status_code == 422
+
+def test_order_captures_total_and_list_returns_summaries():
+    item = client.post("/api/menu/", json={"name": "Cake", "price": 3.25}).json()
+    order = {"customer_name": "Sum", "address": "3 Elm", "phone": "555", "items": [{"menu_item_id": item["id"], "quantity": 4}]}
+    created = client.post("/api/orders/", json=order).json()
+    assert created["total"] == 13.0
+    assert created["item_count"] == 4
+    assert created["items"][0]["unit_price"] == 3.25
+    listed = [o for o in client.get("/api/orders/", params={"limit": 1000}).json() if o["id"] == created["id"]]
+    assert listed == [{"id": created["id"], "customer_name": "Sum", "status": "received", "total": 13.0, "item_count": 4}]
+
+def test_fast_json_mode_matches_validated_response(monkeypatch):
+    order_id = client.get("/api/orders/", params={"limit": 1}).json()[0]["id"]
+    validated = client.get(f"/api/orders/{order_id}")
+    monkeypatch.setattr(settings, "fast_json", True)
+    fast = client.get(f"/api/orders/{order_id}")
+    assert fast.status_code == 200
+    assert fast.json() == validated.json()
+    page = client.get("/api/orders/", params={"limit": 1})
+    assert "x-next-cursor" in page.headers
+
+def test_metrics_endpoint():
+    client.get("/api/menu/")
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/menu/",status="200"}' in body
+    assert 'db_query_duration_seconds_count{engine="writer",operation="INSERT",table="orders"}' in body
+    assert "sse_subscribers 0" in body
+
+def test_created_orders_are_published_as_received():
+    sub = registry.subscribe_all()
+    try:
+        order = client.post("/api/orders/", json={
+            "customer_name": "Dash", "address": "1 Dash St", "phone": "555",
+            "items": [{"menu_item_id": 1, "quantity": 1}]
+        }).json()
+        event = sub.queue.get_nowait()
+    finally:
+        registry.unsubscribe(sub)
+    assert (event.order_id, event.status) == (order["id"], "received")
+
+def test_multiplexed_stream_rejects_bad_ids():
+    assert client.get("/api/sse/orders?ids=1,x").status_code == 400
+    assert client.get("/api/sse/orders?ids=").status_code == 400
+
+def _new_order():
+    return client.post("/api/orders/", json={
+        "customer_name": "Flow", "address": "1 Flow St", "phone": "555",
+        "items": [{"menu_item_id": 1, "quantity": 1}]
+    }).json()["id"]
+
+def test_status_transitions_follow_the_order_flow():
+    order_id = _new_order()
+    assert client.patch(f"/api/orders/{order_id}", json={"status": "delivered"}).status_code == 409
+    response = client.patch(f"/api/orders/{order_id}", json={"status": "preparing"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "preparing"
+    assert client.patch(f"/api/orders/{order_id}", json={"status": "preparing"}).status_code == 409
+    assert client.patch(f"/api/orders/{order_id}", json={"status": "received"}).status_code == 409
+    assert client.patch("/api/orders/999999", json={"status": "preparing"}).status_code == 404
+
+def test_status_change_checks_expected_status_and_notifies_once():
+    order_id = _new_order()
+    sub = registry.subscribe(order_id)
+    try:
+        stale = client.patch(f"/api/orders/{order_id}", json={"status": "out_for_delivery", "expected_status": "received"})
+        assert stale.status_code == 409
+        assert sub.queue.empty()
+        ok = client.patch(f"/api/orders/{order_id}", json={"status": "preparing", "expected_status": "received"})
+        assert ok.status_code == 200
+        assert sub.queue.get_nowait().status == "preparing"
+        assert sub.queue.empty()
+    finally:
+        registry.unsubscribe(sub)
+
+def test_concurrent_status_changes_only_one_wins():
+    order_id = _new_order()
+
+    async def race():
+        update = schemas.OrderUpdate(status="preparing")
+        return await asyncio.gather(
+            crud.update_order_(order_id, update), crud.update_order_(order_id, update), return_exceptions=True
+        )
+
+    results = asyncio.run(race())
+    assert sum(isinstance(r, dict) for r in results) == 1
+    assert sum(isinstance(r, crud.StatusConflictError) for r in results) == 1
+
+def test_menu_import_upserts_and_export_round_trips():
+    csv_body = (
+        "name,description,price,image_url\n"
+        'Imported Soup,"Hot, with ""extra""\nbread",4.5,\n'
+        "Bad Row,,not-a-price,\n"
+    )
+    report = client.post("/api/menu/import", params={"format": "csv"}, content=csv_body).json()
+    assert report["imported"] == 1
+    assert report["failed"] == 1
+    assert report["errors"][0]["record"] == 2
+
+    exported = client.get("/api/menu/export", params={"format": "ndjson"})
+    assert exported.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in exported.text.splitlines()]
+    soup = next(i for i in items if i["name"] == "Imported Soup")
+    assert soup["description"] == 'Hot, with "extra"\nbread'
+
+    update = json.dumps({"id": soup["id"], "name": "Imported Soup", "price": 5.25}) + "\n{not json}\n"
+    report = client.post("/api/menu/import", params={"format": "ndjson"}, content=update).json()
+    assert (report["imported"], report["failed"]) == (1, 1)
+    menu = client.get("/api/menu/").json()
+    assert next(i for i in menu if i["id"] == soup["id"])["price"] == 5.25
+
+    csv_export = client.get("/api/menu/export").text
+    assert csv_export.splitlines()[0] == "id,name,description,price,image_url"
+    assert len(menu) == len(items)
+
+def test_menu_search_ranks_prefix_matches_and_tracks_updates():
+    rows = [
+        {"name": "Truffle Risotto", "description": "Arborio rice", "price": 14},
+        {"name": "Mushroom Soup", "description": "With truffle oil", "price": 6},
+        {"name": "Plain Rice", "description": "Steamed", "price": 2},
+    ]
+    client.post("/api/menu/import", params={"format": "ndjson"}, content="\n".join(json.dumps(r) for r in rows))
+    names = [i["name"] for i in client.get("/api/menu/search", params={"q": "truff"}).json()]
+    assert names[:2] == ["Truffle Risotto", "Mushroom Soup"]
+    assert [i["name"] for i in client.get("/api/menu/search", params={"q": "plain ri", "limit": 1}).json()] == ["Plain Rice"]
+    assert client.get("/api/menu/search", params={"q": '"*'}).json() == []
+
+    plain = client.get("/api/menu/search", params={"q": "plain"}).json()[0]
+    update = {"id": plain["id"], "name": "Jasmine Rice", "price": 2}
+    client.post("/api/menu/import", params={"format": "ndjson"}, content=json.dumps(update))
+    assert client.get("/api/menu/search", params={"q": "plain"}).json() == []
+    assert client.get("/api/menu/search", params={"q": "jasmine"}).json()[0]["id"] == plain["id"]
+
+def test_menu_search_ranks_every_match():
+    # More name matches than the old 1000-row ranking cap, the best one last.
+    rows = [{"name": f"Zesty Side {n}", "description": "Goes well with noodles", "price": 3} for n in range(1100)]
+    rows.append({"name": "Zesty", "description": "Lemon", "price": 9})
+    client.post("/api/menu/import", params={"format": "ndjson"}, content="\n".join(json.dumps(r) for r in rows))
+    results = client.get("/api/menu/search", params={"q": "zesty", "limit": 3}).json()
+    assert results[0]["name"] == "Zesty"
+    assert len(results) == 3
+
+def test_idempotency_key_replays_first_response():
+    order = {"customer_name": "Retry", "address": "1 Retry Rd", "phone": "555", "items": [{"menu_item_id": 1, "quantity": 2}]}
+    headers = {"Idempotency-Key": "retry-test-1"}
+    first = client.post("/api/orders/", json=order, headers=headers)
+    assert first.status_code == 201
+    before = len(client.get("/api/orders/", params={"limit": 1000}).json())
+
+    again = client.post("/api/orders/", json=order, headers=headers)
+    assert again.status_code == 201
+    assert again.headers["idempotent-replayed"] == "true"
+    assert again.json() == first.json()
+
+    # Survives losing the in-process cache (restart, or another worker).
+    crud.idempotency_cache.clear()
+    assert client.post("/api/orders/", json=order, headers=headers).json()["id"] == first.json()["id"]
+    assert len(client.get("/api/orders/", params={"limit": 1000}).json()) == before
+
+    changed = dict(order, customer_name="Someone Else")
+    assert client.post("/api/orders/", json=changed, headers=headers).status_code == 422
+
+def test_order_change_feed_returns_only_changed_orders():
+    head = client.get("/api/orders/changes", params={"since": 10 ** 9})
+    assert head.json() == []
+    assert head.headers["x-next-cursor"] == str(10 ** 9)
+    latest = client.get("/api/orders/changes", params={"limit": 1000})
+    cursor = int(latest.headers["x-next-cursor"])
+    while latest.json():
+        latest = client.get("/api/orders/changes", params={"since": cursor, "limit": 1000})
+        cursor = int(latest.headers["x-next-cursor"])
+
+    first, second = _new_order(), _new_order()
+    client.patch(f"/api/orders/{first}", json={"status": "preparing"})
+    changes = client.get("/api/orders/changes", params={"since": cursor})
+    body = changes.json()
+    assert [c["id"] for c in body] == [second, first]
+    assert body[1]["status"] == "preparing"
+    next_cursor = int(changes.headers["x-next-cursor"])
+    assert next_cursor == body[1]["seq"] > body[0]["seq"]
+
+    page = client.get("/api/orders/changes", params={"since": cursor, "limit": 1})
+    assert [c["id"] for c in page.json()] == [first]
+    assert client.get("/api/orders/changes", params={"since": next_cursor}).json() == []
+
+def test_active_orders_served_from_projection():
+    asyncio.run(crud.active_orders.load(crud.load_active_orders))
+    try:
+        order_id = _new_order()
+        active = client.get("/api/orders/active").json()
+        assert order_id in [o["id"] for o in active]
+        assert all(o["status"] != "delivered" for o in active)
+        assert crud.active_orders.get(order_id) == client.get(f"/api/orders/{order_id}").json()
+
+        for status in ("preparing", "out_for_delivery"):
+            client.patch(f"/api/orders/{order_id}", json={"status": status})
+        assert client.get(f"/api/orders/{order_id}").json()["status"] == "out_for_delivery"
+        assert [o["id"] for o in client.get("/api/orders/active", params={"status": "out_for_delivery"}).json()] == [order_id]
+
+        client.patch(f"/api/orders/{order_id}", json={"status": "delivered"})
+        assert crud.active_orders.get(order_id) is None
+        assert client.get(f"/api/orders/{order_id}").json()["status"] == "delivered"
+        assert order_id not in [o["id"] for o in client.get("/api/orders/active").json()]
+    finally:
+        crud.active_orders.reset()
+    assert order_id not in [o["id"] for o in client.get("/api/orders/active").json()]
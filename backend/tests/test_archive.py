@@ -0,0 +1,79 @@
+import asyncio
+from sqlalchemy import bindparam, text
+from app import archive, crud, schemas
+from app.database import engine
+
+
+async def _deliver(order_id):
+    for status in ("preparing", "out_for_delivery", "delivered"):
+        await crud.update_order_(order_id, schemas.OrderUpdate(status=status))
+
+
+def test_archives_old_delivered_orders_in_batches():
+    async def run():
+        await engine.dispose()
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Archive Soup", price=4.5))
+        order = schemas.OrderCreate(
+            customer_name="Archie", address="1 Old Rd", phone="555",
+            items=[{"menu_item_id": item["id"], "quantity": 2}],
+        )
+        old, recent, active, other = [(await crud.create_order(order))["id"] for _ in range(4)]
+        for order_id in (old, other, recent):
+            await _deliver(order_id)
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("UPDATE orders SET updated_at = updated_at - 7200 WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": [old, other, active]}
+            )
+
+        moved = await archive.archive_delivered_orders(3600, batch_size=1, pause=0)
+        await archive.compact_database()
+
+        async with engine.connect() as conn:
+            live = set((await conn.execute(text("SELECT id FROM orders"))).scalars())
+            archived = set((await conn.execute(text("SELECT id FROM orders_archive"))).scalars())
+            changes = (await conn.execute(
+                text("SELECT count(*) FROM order_changes WHERE order_id IN (:a, :b)"), {"a": old, "b": other}
+            )).scalar()
+        ids = {"old": old, "other": other, "recent": recent, "active": active}
+        return ids, moved, live, archived, changes, await crud.get_order(old), await crud.get_order(active)
+
+    ids, moved, live, archived, changes, old_order, active_order = asyncio.run(run())
+    assert moved == 2
+    assert {ids["old"], ids["other"]} <= archived
+    assert {ids["recent"], ids["active"]} <= live
+    assert not archived & live
+    assert changes == 0
+    assert old_order["status"] == "delivered"
+    assert old_order["total"] == 9.0
+    assert [(i["quantity"], i["unit_price"], i["menu_item"]["name"]) for i in old_order["items"]] == [(2, 4.5, "Archive Soup")]
+    assert active_order["status"] == "received"
+
+
+def test_archiving_the_newest_order_does_not_free_its_id():
+    async def run():
+        await engine.dispose()
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Archive Bread", price=2.0))
+        order = schemas.OrderCreate(
+            customer_name="Newest", address="2 Old Rd", phone="555",
+            items=[{"menu_item_id": item["id"], "quantity": 1}],
+        )
+        newest = await crud.create_order(order)
+        await _deliver(newest["id"])
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE orders SET updated_at = updated_at - 7200 WHERE id = :id"), {"id": newest["id"]})
+        assert await archive.archive_delivered_orders(3600, pause=0) >= 1
+        created = await crud.create_order(order)
+        # A second pass must not collide with ids already in the archive.
+        await _deliver(created["id"])
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE orders SET updated_at = updated_at - 7200 WHERE id = :id"), {"id": created["id"]})
+        await archive.archive_delivered_orders(3600, pause=0)
+        return newest, created, await crud.get_order(newest["id"])
+
+    newest, created, fetched = asyncio.run(run())
+    assert created["id"] > newest["id"]
+    assert created["items"][0]["id"] > newest["items"][0]["id"]
+    assert fetched["customer_name"] == "Newest"
+    assert fetched["items"][0]["id"] == newest["items"][0]["id"]
@@ -0,0 +1,64 @@
+import asyncio
+from sqlalchemy import text
+from app import catalog
+from app.database import AsyncSessionLocal
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_csv_parser_handles_chunk_boundaries_and_multiline_fields():
+    data = 'name,price\n"Long\nname",3\nShort,4\n'.encode()
+
+    async def run():
+        return [r async for r in catalog.parse(_chunks(data, 3), "csv")]
+
+    assert asyncio.run(run()) == [{"name": "Long\nname", "price": "3"}, {"name": "Short", "price": "4"}]
+
+
+def test_csv_parser_matches_csv_reader_and_isolates_bad_records():
+    inches = 'name,description,price\nPizza,12" thin crust,9.99\nSub,6" roll,5.0\n'
+    unclosed = 'name,price\nGood,1\n"Broken,2\nAfter,3\n'
+
+    async def run(data):
+        return [r async for r in catalog.parse(_chunks(data.encode(), 5), "csv")]
+
+    assert asyncio.run(run(inches)) == [
+        {"name": "Pizza", "description": '12" thin crust', "price": "9.99"},
+        {"name": "Sub", "description": '6" roll', "price": "5.0"},
+    ]
+    records = asyncio.run(run(unclosed))
+    assert records[0] == {"name": "Good", "price": "1"}
+    assert isinstance(records[1], catalog.csv.Error)
+    assert records[2:] == [{"name": "After", "price": "3"}]
+
+
+def test_seed_loads_fixture_once(tmp_path):
+    fixture = tmp_path / "menu.ndjson"
+    fixture.write_text('{"name": "Seed A", "price": 1}\n{"name": "Seed B", "price": 2}\n')
+
+    columns = "id, name, description, price, image_url"
+
+    async def run():
+        # Seeding only touches an empty menu: set the other tests' items
+        # aside and put them back afterwards.
+        async with AsyncSessionLocal() as session:
+            saved = (await session.execute(text(f"SELECT {columns} FROM menu_items"))).mappings().all()
+            await session.execute(text("DELETE FROM menu_items"))
+            await session.commit()
+        try:
+            return await catalog.seed_menu(fixture), await catalog.seed_menu(fixture)
+        finally:
+            async with AsyncSessionLocal() as session:
+                await session.execute(text("DELETE FROM menu_items"))
+                if saved:
+                    await session.execute(
+                        text(f"INSERT INTO menu_items ({columns}) VALUES (:id, :name, :description, :price, :image_url)"),
+                        [dict(row) for row in saved],
+                    )
+                await session.commit()
+            catalog.crud.menu_cache.invalidate()
+
+    assert asyncio.run(run()) == (2, 0)
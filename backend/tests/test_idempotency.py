@@ -0,0 +1,38 @@
+import asyncio
+from app import crud, schemas
+from app.database import engine
+from app.idempotency import IdempotencyCache, StoredResponse
+
+
+def _stored(created_at):
+    return StoredResponse("hash", 201, b"{}", created_at)
+
+
+def test_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    cache = IdempotencyCache(max_size=2, ttl=60)
+    cache.put("a", _stored(1000))
+    cache.put("b", _stored(1000))
+    monkeypatch.setattr("app.idempotency.time.time", lambda: 1010)
+    assert cache.get("a") is not None
+    cache.put("c", _stored(1000))
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    monkeypatch.setattr("app.idempotency.time.time", lambda: 1100)
+    assert cache.get("a") is None
+
+
+def test_concurrent_requests_with_one_key_create_one_order():
+    async def run():
+        # Waiting on the writer pool binds it to an event loop; start this
+        # loop with a fresh one.
+        await engine.dispose()
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Idem Pizza", price=9.0))
+        order = schemas.OrderCreate(
+            customer_name="Idem", address="1 Idem St", phone="555",
+            items=[{"menu_item_id": item["id"], "quantity": 1}],
+        )
+        return await asyncio.gather(*(crud.create_order_idempotent(order, "race-key", "h") for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert sum(created is not None for _, created in results) == 1
+    assert len({stored.body for stored, _ in results}) == 1
@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine, text
+from app import migrations
+
+
+def _legacy_database(path):
+    """Schema as created before migrations existed."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE menu_items (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, description VARCHAR, price FLOAT NOT NULL, image_url VARCHAR)"))
+        conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_name VARCHAR NOT NULL, address VARCHAR NOT NULL, phone VARCHAR NOT NULL, status VARCHAR(16) NOT NULL)"))
+        conn.execute(text("CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders (id), menu_item_id INTEGER REFERENCES menu_items (id), quantity INTEGER NOT NULL)"))
+        conn.execute(text("CREATE TABLE schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at FLOAT NOT NULL)"))
+        conn.execute(text("INSERT INTO menu_items VALUES (1, 'Pizza', '', 12.5, '')"))
+        conn.execute(text("INSERT INTO orders VALUES (1, 'Old', 'Addr', '555', 'delivered')"))
+        conn.execute(text("INSERT INTO order_items VALUES (1, 1, 1, 2)"))
+    return engine
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    engine = _legacy_database(tmp_path / "legacy.db")
+    with engine.begin() as conn:
+        ran = migrations.run_migrations(conn)
+    assert ran == sorted(m.version for m in migrations.MIGRATIONS)
+    with engine.connect() as conn:
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list(order_items)"))}
+        assert "ix_order_items_order_id" in indexes
+        assert conn.execute(text("SELECT total, item_count FROM orders")).one() == (25.0, 2)
+        assert conn.execute(text("SELECT unit_price FROM order_items")).scalar() == 12.5
+        assert conn.execute(text("SELECT order_id, status FROM order_changes")).all() == [(1, "delivered")]
+        assert conn.execute(text("SELECT updated_at IS NOT NULL FROM orders")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM orders_archive")).scalar() == 0
+        assert conn.execute(text("SELECT order_count, revenue, delivered_orders FROM sales_hourly")).one() == (1, 25.0, 1)
+        assert conn.execute(text("SELECT menu_item_id, quantity, delivered_revenue FROM sales_item_hourly")).one() == (1, 2, 25.0)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM order_items"))
+        conn.execute(text("DELETE FROM orders"))
+        conn.execute(text("INSERT INTO orders (customer_name, address, phone, status) VALUES ('New', 'Addr', '555', 'received')"))
+        assert conn.execute(text("SELECT id FROM orders")).scalar() == 2
+        assert "AUTOINCREMENT" in conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'order_items'")).scalar()
+        assert migrations.run_migrations(conn) == []
+    engine.dispose()
@@ -0,0 +1,75 @@
+import asyncio
+from app.projection import ActiveOrders
+
+
+def _order(order_id, status="received"):
+    return {"id": order_id, "customer_name": "P", "address": "A", "phone": "1", "status": status,
+            "total": 1.0, "item_count": 1, "items": []}
+
+
+def _loaded(*orders):
+    projection = ActiveOrders()
+
+    async def loader():
+        return list(orders)
+
+    asyncio.run(projection.load(loader))
+    return projection
+
+
+def test_inactive_until_loaded():
+    projection = ActiveOrders()
+    projection.add(_order(1))
+    assert projection.get(1) is None
+    assert not projection.loaded
+
+
+def test_status_changes_move_forward_and_evict_delivered():
+    projection = _loaded(_order(1), _order(2, "preparing"), _order(3, "delivered"))
+    assert [o["id"] for o in projection.summaries()] == [1, 2]
+    projection.set_status(1, "out_for_delivery")
+    projection.set_status(1, "preparing")  # late event, ignored
+    assert projection.get(1)["status"] == "out_for_delivery"
+    assert [o["id"] for o in projection.summaries(["preparing"])] == [2]
+    projection.set_status(2, "delivered")
+    assert projection.get(2) is None
+    assert len(projection) == 1
+
+
+def test_event_for_unknown_order_fetches_and_replays_newer_status():
+    async def run():
+        projection = ActiveOrders()
+
+        async def no_orders():
+            return []
+
+        await projection.load(no_orders)
+        fetched = asyncio.Event()
+
+        async def fetch(order_id):
+            await fetched.wait()
+            return _order(order_id)
+
+        projection.apply_event(7, "received", fetch)
+        projection.apply_event(7, "preparing", fetch)
+        assert projection.get(7) is None
+        fetched.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return projection.get(7)
+
+    assert asyncio.run(run())["status"] == "preparing"
+
+
+def test_projection_is_opt_in_at_startup(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import crud
+    from app.config import settings
+    from app.main import app
+
+    with TestClient(app):
+        assert not crud.active_orders.loaded
+    monkeypatch.setattr(settings, "active_orders_projection", True)
+    with TestClient(app):
+        assert crud.active_orders.loaded
+    assert not crud.active_orders.loaded
@@ -0,0 +1,117 @@
+"""Guard the hot queries in crud.py against full table scans.
+
+Each test runs a crud function, captures the SQL it sends, and checks
+EXPLAIN QUERY PLAN for `SCAN <table>` steps. Loading the whole menu for the
+menu cache is a deliberate scan and is not covered here.
+"""
+import asyncio
+import re
+import pytest
+from sqlalchemy import event
+from app import crud, schemas
+from app.database import engine, read_engine
+from app.models import OrderStatus
+
+TABLES = {"orders", "order_items", "menu_items", "order_changes"}
+ALIASES = {"o": "orders", "oi": "order_items", "mi": "menu_items", "c": "order_changes"}
+
+
+def _run_and_capture(coro_fn):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") or " RETURNING " in statement.upper():
+            statements.append((statement, parameters))
+
+    async def run():
+        engines = {engine.sync_engine, read_engine.sync_engine}
+        for e in engines:
+            event.listen(e, "before_cursor_execute", capture)
+        try:
+            await coro_fn()
+        finally:
+            for e in engines:
+                event.remove(e, "before_cursor_execute", capture)
+        plans = []
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                if statement.lstrip().upper().startswith("INSERT"):
+                    continue
+                raw = await conn.get_raw_connection()
+                cursor = await raw.driver_connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                plans.append((statement, [row[3] for row in await cursor.fetchall()]))
+        return plans
+
+    return asyncio.run(run())
+
+
+def _table_scans(plan):
+    # Subqueries show up as CO-ROUTINE/MATERIALIZE steps under their alias;
+    # scanning those reads only what the inner query selected.
+    subqueries = {
+        m.group(1) for m in (re.match(r"(?:CO-ROUTINE|MATERIALIZE) (\w+)", d) for d in plan) if m
+    }
+    scans = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if not match or match.group(1) in subqueries:
+            continue
+        if ALIASES.get(match.group(1), match.group(1)) in TABLES:
+            scans.append(detail)
+    return scans
+
+
+def _assert_no_scans(plans):
+    assert plans, "no statements captured"
+    for statement, plan in plans:
+        assert not _table_scans(plan), f"full scan in:\n{statement}\n{plan}"
+
+
+@pytest.fixture(scope="module")
+def order_id():
+    async def setup():
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Plan Pizza", price=9.0))
+        order = await crud.create_order(schemas.OrderCreate(
+            customer_name="Plan", address="1 Plan St", phone="555",
+            items=[{"menu_item_id": item["id"], "quantity": 1}],
+        ))
+        return order["id"]
+    return asyncio.run(setup())
+
+
+def test_get_order_uses_indexes(order_id):
+    _assert_no_scans(_run_and_capture(lambda: crud.get_order(order_id)))
+
+
+def test_orders_page_uses_indexes(order_id):
+    _assert_no_scans(_run_and_capture(lambda: crud.get_orders_page(after_id=0, limit=10)))
+
+
+def test_orders_page_status_filter_uses_indexes(order_id):
+    _assert_no_scans(_run_and_capture(
+        lambda: crud.get_orders_page(statuses=[OrderStatus.received], limit=10)
+    ))
+
+
+def test_create_order_menu_lookup_uses_indexes(order_id):
+    async def create():
+        await crud.create_order(schemas.OrderCreate(
+            customer_name="Plan", address="1 Plan St", phone="555",
+            items=[{"menu_item_id": 1, "quantity": 2}],
+        ))
+    _assert_no_scans(_run_and_capture(create))
+
+
+def test_order_summaries_snapshot_uses_indexes(order_id):
+    _assert_no_scans(_run_and_capture(lambda: crud.get_order_summaries(statuses=[OrderStatus.received])))
+    _assert_no_scans(_run_and_capture(lambda: crud.get_order_summaries(order_ids=[order_id])))
+
+
+def test_menu_search_uses_fts_index(order_id):
+    plans = _run_and_capture(lambda: crud.search_menu_items("plan piz", 10))
+    _assert_no_scans(plans)
+    assert any("VIRTUAL TABLE INDEX" in step for _, plan in plans for step in plan)
+
+
+def test_order_changes_feed_uses_indexes(order_id):
+    _assert_no_scans(_run_and_capture(lambda: crud.get_order_changes(since=0, limit=10)))
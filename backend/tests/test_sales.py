@@ -0,0 +1,60 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app import analytics, crud, responses
+from app.database import engine
+from app.main import app
+
+client = TestClient(app)
+
+
+def _order(*lines):
+    return {"customer_name": "Sal", "address": "9 Market St", "phone": "555",
+            "items": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in lines]}
+
+
+def test_rollups_follow_checkouts_and_deliveries():
+    soup = client.post("/api/menu/", json={"name": "Rollup Soup", "price": 4.0}).json()["id"]
+    bread = client.post("/api/menu/", json={"name": "Rollup Bread", "price": 1.5}).json()["id"]
+    first = client.post("/api/orders/", json=_order((soup, 2), (bread, 1), (soup, 1))).json()["id"]
+    client.post("/api/orders/", json=_order((soup, 1)))
+    for status in ("preparing", "out_for_delivery", "delivered"):
+        assert client.patch(f"/api/orders/{first}", json={"status": status}).status_code == 200
+
+    response = client.get("/api/analytics/sales", params={"menu_item_id": soup, "group_by": "item"})
+    assert response.status_code == 200
+    assert response.json() == [{
+        "hour": None, "menu_item_id": soup, "menu_item_name": "Rollup Soup",
+        "order_count": 2, "quantity": 4, "revenue": 16.0,
+        "delivered_orders": 1, "delivered_revenue": 12.0,
+    }]
+    rows = client.get("/api/analytics/sales", params={"menu_item_id": bread}).json()
+    assert [(r["quantity"], r["revenue"], r["delivered_revenue"]) for r in rows] == [(1, 1.5, 1.5)]
+    assert rows[0]["hour"].endswith(":00:00Z")
+
+
+def test_sales_rows_are_encoded_as_returned_by_crud(monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    rows = asyncio.run(crud.get_sales(group_by="hour"))
+    assert rows and responses.dumps(rows).count(b'Z"') == len(rows)
+    served = client.get("/api/analytics/sales", params={"group_by": "hour"}).json()
+    assert [r["hour"] for r in served] == [r["hour"] for r in rows]
+
+
+def test_rebuild_matches_incremental_rollups():
+    async def run():
+        await engine.dispose()
+        before = await crud.get_sales(group_by="item_hour"), await crud.get_sales(group_by="hour")
+        orders = await analytics.rebuild_sales_rollups(batch_size=2)
+        after = await crud.get_sales(group_by="item_hour"), await crud.get_sales(group_by="hour")
+        return orders, before, after
+
+    orders, before, after = asyncio.run(run())
+    assert orders > 0
+    assert before[0] and before[1]
+    assert after == before
+
+
+def test_sales_range_is_validated_and_filtered():
+    assert client.get("/api/analytics/sales", params={"start": "2024-01-02T00:00:00", "end": "2024-01-01T00:00:00"}).status_code == 422
+    assert client.get("/api/analytics/sales", params={"end": "2000-01-01T00:00:00Z"}).json() == []
+    assert client.get("/api/analytics/sales", params={"group_by": "day"}).status_code == 422
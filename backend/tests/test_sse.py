@@ -0,0 +1,207 @@
+import asyncio
+import json
+from app import broker as broker_module
+from app import crud, schemas, sse
+from app.broker import Event, InProcessBroker, SQLiteBroker
+from app.database import engine, Base
+from app.sse import StatusFilter, SubscriptionRegistry, Subscription
+
+
+def test_publish_only_reaches_matching_order():
+    reg = SubscriptionRegistry()
+    watching = reg.subscribe(1)
+    other = reg.subscribe(2)
+    event = Event(1, 1, "preparing")
+    assert reg.publish(event) == 1
+    assert watching.queue.get_nowait() is event
+    assert other.queue.empty()
+
+
+def test_unsubscribe_removes_empty_topic():
+    reg = SubscriptionRegistry()
+    sub = reg.subscribe(5)
+    reg.unsubscribe(sub)
+    assert reg.count() == 0
+    assert reg.publish(Event(1, 5, "preparing")) == 0
+
+
+def test_multi_order_and_wildcard_subscriptions():
+    reg = SubscriptionRegistry()
+    many = reg.subscribe_many([1, 2, 2])
+    everything = reg.subscribe_all()
+    single = reg.subscribe(2)
+    assert reg.publish(Event(1, 2, "preparing")) == 3
+    assert reg.publish(Event(2, 3, "preparing")) == 1
+    assert [many.queue.qsize(), everything.queue.qsize(), single.queue.qsize()] == [1, 2, 1]
+    assert reg.count() == 3
+    reg.unsubscribe(many)
+    reg.unsubscribe(everything)
+    assert reg.count() == 1
+    assert reg.publish(Event(3, 1, "preparing")) == 0
+
+
+def test_status_filter_reports_orders_leaving_the_view():
+    f = StatusFilter(["received", "preparing"])
+    f.reset([{"id": 1}])
+    assert f.accept(Event(1, 1, "preparing"))
+    assert f.accept(Event(2, 1, "out_for_delivery"))
+    assert not f.accept(Event(3, 1, "delivered"))
+    assert f.accept(Event(4, 2, "received"))
+    assert not f.accept(Event(5, 3, "delivered"))
+    assert StatusFilter(None).accept(Event(6, 3, "delivered"))
+
+
+def test_slow_consumer_drops_oldest():
+    async def run():
+        sub = Subscription((1,), maxsize=2)
+        for i in range(4):
+            sub.push(Event(i, 1, "preparing"))
+        return [sub.queue.get_nowait().id, sub.queue.get_nowait().id], sub.dropped
+
+    ids, dropped = asyncio.run(run())
+    assert ids == [2, 3]
+    assert dropped == 2
+
+
+def test_event_frame_carries_id():
+    event = Event(7, 3, "delivered")
+    assert event.frame == 'id: 7\ndata: {"order_id": 3, "status": "delivered"}\n\n'
+
+
+def test_in_process_broker_replays_after_last_event_id():
+    async def run():
+        delivered = []
+        broker = InProcessBroker(delivered.append)
+        await broker.publish(1, "preparing")
+        await broker.publish(2, "preparing")
+        await broker.publish(1, "out_for_delivery")
+        return delivered, await broker.replay(1, 1)
+
+    delivered, replayed = asyncio.run(run())
+    assert [e.id for e in delivered] == [1, 2, 3]
+    assert [(e.id, e.status) for e in replayed] == [(3, "out_for_delivery")]
+
+
+def test_sqlite_broker_shares_events_between_instances():
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        seen = []
+        worker_a = SQLiteBroker(lambda e: 0, poll_interval=0.01)
+        worker_b = SQLiteBroker(seen.append, poll_interval=0.01)
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            first = await worker_a.publish(42, "preparing")
+            second = await worker_a.publish(42, "out_for_delivery")
+            for _ in range(100):
+                if len(seen) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            replayed = await worker_b.replay(42, first.id)
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+        return seen, replayed, second
+
+    seen, replayed, second = asyncio.run(run())
+    assert [e.status for e in seen] == ["preparing", "out_for_delivery"]
+    assert [e.id for e in replayed] == [second.id]
+
+
+def test_sqlite_broker_keeps_polling_after_a_failed_poll(monkeypatch):
+    read_session = broker_module.ReadSessionLocal
+    failures = []
+
+    def flaky_session():
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("database is locked")
+        return read_session()
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        seen = []
+        worker_a = SQLiteBroker(lambda e: 0, poll_interval=0.01)
+        worker_b = SQLiteBroker(seen.append, poll_interval=0.01)
+        await worker_a.start()
+        await worker_b.start()
+        monkeypatch.setattr(broker_module, "ReadSessionLocal", flaky_session)
+        try:
+            await worker_a.publish(43, "preparing")
+            for _ in range(100):
+                if seen:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+        return seen
+
+    seen = asyncio.run(run())
+    assert failures
+    assert [(e.order_id, e.status) for e in seen] == [(43, "preparing")]
+
+
+def test_sqlite_broker_publish_many_keeps_order():
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        delivered = []
+        broker = SQLiteBroker(delivered.append)
+        events = await broker.publish_many([(7, "received"), (8, "received"), (9, "received")])
+        return events, delivered, await broker.replay(8, events[0].id)
+
+    events, delivered, replayed = asyncio.run(run())
+    assert [e.order_id for e in events] == [7, 8, 9]
+    assert events[0].id < events[1].id < events[2].id
+    assert delivered == events
+    assert [e.id for e in replayed] == [events[1].id]
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_multiplexed_resync_does_not_replay_events_behind_the_snapshot(monkeypatch):
+    monkeypatch.setattr(sse, "MULTIPLEX_QUEUE_SIZE", 3)
+
+    async def advance(order_id, status):
+        await crud.update_order_(order_id, schemas.OrderUpdate(status=status))
+        await sse.notify_subscribers(order_id, status)
+
+    def data(frame):
+        return json.loads(frame.split("data: ", 1)[1])
+
+    async def run():
+        await engine.dispose()
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Resync Tea", price=2.0))
+        order = schemas.OrderCreate(
+            customer_name="Resync", address="3 Queue Ln", phone="555",
+            items=[{"menu_item_id": item["id"], "quantity": 1}],
+        )
+        watched, other = [(await crud.create_order(order))["id"] for _ in range(2)]
+        response = await sse.stream_orders_status(_ConnectedRequest(), ids=f"{watched},{other}", status=None)
+        frames = response.body_iterator
+        first = await frames.__anext__()
+        # Four events into a queue of three evict the first one. The stream
+        # sends the queue head, then resyncs with a snapshot that already
+        # shows "delivered" while "out_for_delivery" is still queued.
+        await advance(watched, "preparing")
+        await advance(other, "preparing")
+        await advance(watched, "out_for_delivery")
+        await advance(watched, "delivered")
+        gap, resync = await frames.__anext__(), await frames.__anext__()
+        await advance(other, "out_for_delivery")
+        following = await frames.__anext__()
+        await frames.aclose()
+        return watched, other, first, gap, resync, following
+
+    watched, other, first, gap, resync, following = asyncio.run(run())
+    assert first.startswith("event: snapshot")
+    assert data(gap) == {"order_id": other, "status": "preparing"}
+    assert resync.startswith("event: snapshot")
+    assert {o["id"]: o["status"] for o in data(resync)} == {watched: "delivered", other: "preparing"}
+    assert data(following) == {"order_id": other, "status": "out_for_delivery"}
@@ -0,0 +1,126 @@
+import asyncio
+from sqlalchemy import text
+from app import crud, metrics, schemas
+from app.broker import SQLiteBroker
+from app.catalog import import_menu
+from app.database import ReadSessionLocal, engine
+from app.writer import GroupCommitWriter
+
+
+def _order(menu_item_id):
+    return schemas.OrderCreate(
+        customer_name="Group", address="1 Batch St", phone="555",
+        items=[{"menu_item_id": menu_item_id, "quantity": 1}],
+    )
+
+
+def test_concurrent_writes_share_one_commit():
+    async def run():
+        writer = GroupCommitWriter(interval=0.05, max_batch=8)
+        await writer.start()
+        before = metrics.group_commit_batch_size.count()
+        try:
+            results = await asyncio.gather(
+                *(writer.submit(_create) for _ in range(5)),
+                writer.submit(_fail),
+                return_exceptions=True,
+            )
+        finally:
+            await writer.stop()
+        return results, metrics.group_commit_batch_size.count() - before
+
+    async def _create(session):
+        result = await session.execute(
+            text("INSERT INTO orders (customer_name, address, phone, status, total, item_count) "
+                 "VALUES ('Group', '1 Batch St', '555', 'received', 10, 1) RETURNING id")
+        )
+        return result.scalar_one()
+
+    async def _fail(session):
+        await session.execute(text("UPDATE orders SET customer_name = 'rolled back'"))
+        raise ValueError("boom")
+
+    results, batches = asyncio.run(run())
+    assert batches == 1
+    assert isinstance(results[-1], ValueError)
+    order_ids = results[:-1]
+    assert len(set(order_ids)) == 5
+
+    async def names():
+        async with ReadSessionLocal() as session:
+            result = await session.execute(text("SELECT COUNT(*) FROM orders WHERE customer_name = 'rolled back'"))
+            return result.scalar()
+    assert asyncio.run(names()) == 0
+
+
+def test_crud_routes_through_running_writer():
+    async def run():
+        item = await crud.create_menu_item(schemas.MenuItemCreate(name="Routed Pizza", price=7.0))
+        await crud.writer.start()
+        try:
+            orders = await asyncio.gather(*(crud.create_order(_order(item["id"])) for _ in range(3)))
+            updated = await crud.update_order_(orders[0]["id"], schemas.OrderUpdate(status="preparing"))
+            batch = await crud.create_orders_batch([_order(item["id"]), _order(999999)])
+            try:
+                await crud.create_order(_order(999999))
+                unknown = None
+            except crud.UnknownMenuItemError as exc:
+                unknown = exc
+        finally:
+            await crud.writer.stop()
+        return orders, updated, batch, unknown
+
+    orders, updated, batch, unknown = asyncio.run(run())
+    assert [o["total"] for o in orders] == [7.0] * 3
+    assert updated["status"] == "preparing"
+    assert batch[0]["order"]["total"] == 7.0 and batch[1]["error"]
+    assert unknown is not None
+    assert not crud.writer.running
+
+
+def test_menu_and_event_writes_queue_behind_an_open_batch(monkeypatch):
+    submitted = []
+    submit = crud.writer.submit
+
+    def recording_submit(op):
+        submitted.append(op)
+        return submit(op)
+
+    async def records():
+        yield {"name": "Queued Import", "price": "3.00"}
+
+    async def run():
+        await engine.dispose()
+        await crud.writer.start()
+        monkeypatch.setattr(crud.writer, "submit", recording_submit)
+        release = asyncio.Event()
+
+        async def hold(session):
+            await session.execute(text("UPDATE menu_items SET name = name WHERE id = -1"))
+            await release.wait()
+
+        try:
+            held = asyncio.create_task(crud.writer.submit(hold))
+            await asyncio.sleep(0.01)
+            broker = SQLiteBroker(lambda event: 0)
+            writes = asyncio.gather(
+                crud.create_menu_item(schemas.MenuItemCreate(name="Queued Soup", price=2.0)),
+                import_menu(records()),
+                broker.publish(1, "received"),
+                broker.publish_many([(2, "received")]),
+            )
+            await asyncio.sleep(0.05)
+            queued = crud.writer.queued()
+            release.set()
+            item, imported, event, events = await asyncio.wait_for(writes, 5)
+            await held
+        finally:
+            await crud.writer.stop()
+        return len(submitted), queued, item, imported, event, events
+
+    submitted_ops, queued, item, imported, event, events = asyncio.run(run())
+    assert submitted_ops == 5
+    assert queued == 4
+    assert item["name"] == "Queued Soup"
+    assert imported["imported"] == 1
+    assert events[0].id > event.id
@@ -96,7 +96,7 @@ export const OrderTracker: React.FC<OrderTrackerProps> = ({ orderId, onBack }) =
   }
 
   const currentStepIndex = steps.indexOf(order.status);
-  const total = order.items.reduce((sum, oi) => sum + oi.menu_item.price * oi.quantity, 0);
+  const total = order.total;
 
   return (
     <div className="card">
@@ -127,7 +127,7 @@ export const OrderTracker: React.FC<OrderTrackerProps> = ({ orderId, onBack }) =
               <strong>{oi.menu_item.name}</strong>
               <div style={{ opacity: 0.75 }}>Qty: {oi.quantity}</div>
             </div>
-            <div style={{ fontWeight: 700 }}>${(oi.menu_item.price * oi.quantity).toFixed(2)}</div>
+            <div style={{ fontWeight: 700 }}>${((oi.unit_price ?? oi.menu_item.price) * oi.quantity).toFixed(2)}</div>
           </div>
         ))}
       </div>
@@ -1,33 +1,39 @@
-import React, { useEffect, useMemo, useState } from 'react';
-import { ordersApi, Order } from '../services/api';
+import React, { useEffect, useState } from 'react';
+import { ordersApi, OrderSummary } from '../services/api';
 
 interface OrdersListProps {
   onSelectOrder: (orderId: number) => void;
 }
 
 export const OrdersList: React.FC<OrdersListProps> = ({ onSelectOrder }) => {
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     ordersApi
-      .getAll()
-      .then(setOrders)
+      .getPage()
+      .then((page) => {
+        setOrders(page.orders);
+        setNextCursor(page.nextCursor);
+      })
       .catch((err) => console.error('Failed to load orders:', err))
       .finally(() => setLoading(false));
   }, []);
 
-  const totalsById = useMemo(() => {
-    const map = new Map<number, number>();
-    for (const order of orders) {
-      const total = order.items.reduce(
-        (sum, oi) => sum + oi.menu_item.price * oi.quantity,
-        0
-      );
-      map.set(order.id, total);
-    }
-    return map;
-  }, [orders]);
+  const loadMore = () => {
+    if (nextCursor === null) return;
+    setLoadingMore(true);
+    ordersApi
+      .getPage(nextCursor)
+      .then((page) => {
+        setOrders((current) => [...current, ...page.orders]);
+        setNextCursor(page.nextCursor);
+      })
+      .catch((err) => console.error('Failed to load more orders:', err))
+      .finally(() => setLoadingMore(false));
+  };
 
   if (loading) {
     return (
@@ -61,14 +67,13 @@ export const OrdersList: React.FC<OrdersListProps> = ({ onSelectOrder }) => {
                 <div>
                   <h3 style={{ margin: 0 }}>Order #{order.id}</h3>
                   <p style={{ marginTop: '0.25rem' }}>
-                    {order.items.slice(0, 2).map((oi) => `${oi.quantity}× ${oi.menu_item.name}`).join(' • ')}
-                    {order.items.length > 2 ? ` • +${order.items.length - 2} more` : ''}
+                    {order.item_count} {order.item_count === 1 ? 'item' : 'items'}
                   </p>
                 </div>
                 <div style={{ display: 'grid', justifyItems: 'end', gap: '0.5rem' }}>
                   <span className={`status-badge status-${order.status}`}>{order.status.replace(/_/g, ' ')}</span>
                   <div style={{ fontWeight: 800, color: 'var(--text-color)' }}>
-                    ${Number(totalsById.get(order.id) ?? 0).toFixed(2)}
+                    ${Number(order.total).toFixed(2)}
                   </div>
                 </div>
               </div>
@@ -76,6 +81,11 @@ export const OrdersList: React.FC<OrdersListProps> = ({ onSelectOrder }) => {
           ))}
         </div>
       )}
+      {nextCursor !== null && (
+        <button className="load-more-btn" onClick={loadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading...' : 'Load older orders'}
+        </button>
+      )}
     </div>
   );
 };
@@ -20,18 +20,37 @@ export interface OrderItem {
   id: number;
   menu_item_id: number;
   quantity: number;
+  unit_price: number | null;
   menu_item: MenuItem;
 }
 
+export type OrderStatus = 'received' | 'preparing' | 'out_for_delivery' | 'delivered';
+
+export interface OrderSummary {
+  id: number;
+  customer_name: string;
+  status: OrderStatus;
+  total: number;
+  item_count: number;
+}
+
 export interface Order {
   id: number;
   customer_name: string;
   address: string;
   phone: string;
-  status: 'received' | 'preparing' | 'out_for_delivery' | 'delivered';
+  status: OrderStatus;
+  total: number;
+  item_count: number;
   items: OrderItem[];
 }
 
+export interface OrdersPage {
+  orders: OrderSummary[];
+  // Pass back as `after` for the next (older) page; null on the last page.
+  nextCursor: number | null;
+}
+
 export interface OrderCreate {
   customer_name: string;
   address: string;
@@ -44,11 +63,16 @@ export const menuApi = {
 };
 
 export const ordersApi = {
-  getAll: () => api.get<Order[]>('/orders/').then(res => res.data),
+  // Newest first, one keyset page at a time.
+  getPage: (after?: number) =>
+    api.get<OrderSummary[]>('/orders/', { params: { order: 'desc', after } }).then(res => ({
+      orders: res.data,
+      nextCursor: res.headers['x-next-cursor'] ? Number(res.headers['x-next-cursor']) : null,
+    })),
   getOne: (id: number) => api.get<Order>(`/orders/${id}`).then(res => res.data),
   create: (data: OrderCreate) => api.post<Order>('/orders/', data).then(res => res.data),
-  updateStatus: (id: number, status: string) =>
-    api.patch<Order>(`/orders/${id}`, { status }).then(res => res.data),
+  updateStatus: (id: number, status: OrderStatus, expectedStatus?: OrderStatus) =>
+    api.patch<OrderSummary>(`/orders/${id}`, { status, expected_status: expectedStatus }).then(res => res.data),
 };
 
 export const sseApi = {